@@ -0,0 +1,246 @@
+"""
+Bakes the sprite sheets and every scaled frame the game cuts from them into
+a single file, so startup needs no PNG decoding and no scaling.
+
+    python mario_bake.py
+
+The file holds a JSON index followed by the raw display-format pixels.
+The index records the size and modification time of every source image;
+if any of them changed, setup falls back to the PNGs until the bake is
+rebuilt.
+"""
+
+import json
+import os
+import struct
+import pygame as pg
+from . import tools
+
+BAKE_VERSION = 1
+BAKE_PATH = os.path.join('resources', 'baked', 'graphics.bake')
+MAGIC = b'MARIOBAKE'
+ACCEPT = ('.png', 'jpg', 'bmp')
+# Byte order of the usual 32 bit display surface, so convert() on load is
+# a plain copy.  Any order pygame knows would work, only slower.
+PIXEL_FORMAT = 'BGRA'
+
+
+def source_stamps(directory, accept=ACCEPT):
+    """Size and modification time of every image load_all_gfx would read"""
+    stamps = {}
+    for pic in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(pic)
+        if ext.lower() in accept:
+            info = os.stat(os.path.join(directory, pic))
+            stamps[pic] = [info.st_size, info.st_mtime_ns]
+    return stamps
+
+
+def load_graphics(directory, path=BAKE_PATH, pool=None):
+    """Returns the GFX dictionary.  Uses the bake when it is up to date,
+    which also fills the shared frame cache; otherwise decodes the PNGs
+    (on the thread pool, if given)."""
+    graphics = read_bake(directory, path)
+    if graphics is None:
+        graphics = tools.load_all_gfx(directory, pool=pool)
+    return graphics
+
+
+def read_bake(directory, path=BAKE_PATH):
+    """Loads the bake at path in one read.  Returns None if it is missing,
+    stale or unreadable, without touching the frame cache."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as bake_file:
+        data = bake_file.read()
+    try:
+        if not data.startswith(MAGIC):
+            raise ValueError('not a bake file')
+        start = len(MAGIC) + 4
+        index_length, = struct.unpack('<I', data[len(MAGIC):start])
+        index = json.loads(data[start:start+index_length].decode('utf-8'))
+    except (ValueError, struct.error) as e:
+        print("烘焙资源无法读取，改为读取原始图片: {}".format(e))
+        return None
+
+    if (index['version'] != BAKE_VERSION or
+            index['sources'] != source_stamps(directory)):
+        print("烘焙资源已过期，改为读取原始图片（运行 python mario_bake.py 重新生成）")
+        return None
+
+    pixels = memoryview(data)[start+index_length:]
+    try:
+        graphics, cached = decode_bake(index, pixels)
+    except (ValueError, KeyError, IndexError, TypeError, pg.error) as e:
+        print("烘焙资源已损坏，改为读取原始图片（运行 python mario_bake.py 重新生成）: {}".format(e))
+        return None
+    tools.frame_cache.update(cached)
+    return graphics
+
+
+def decode_bake(index, pixels):
+    """Rebuilds the sheets and the frame cache entries of a bake.  Every
+    entry is checked against the pixel data first, so a truncated file
+    raises ValueError instead of failing inside pygame."""
+    for entry in list(index['sheets'].values()) + index['frames']:
+        check_entry(pixels, entry)
+
+    graphics = {}
+    for name, entry in index['sheets'].items():
+        graphics[name] = surface_from_entry(pixels, entry)
+
+    cached = {}
+    frames = []
+    for entry in index['frames']:
+        frame = surface_from_entry(pixels, entry)
+        if 'flip_of' in entry:
+            key = (frames[entry['flip_of']],) + tuple(entry['flip'])
+        else:
+            key = (graphics[entry['sheet']], tuple(entry['rect']),
+                   to_key(entry['scale']), to_key(entry['colorkey']),
+                   tuple(entry['flip']))
+        cached[key] = frame
+        frames.append(frame)
+    return graphics, cached
+
+
+def check_entry(pixels, entry):
+    """Raises ValueError unless entry's pixels are all in the data"""
+    width, height = entry['size']
+    offset, length = entry['offset'], entry['length']
+    if length and length != width * height * len(PIXEL_FORMAT):
+        raise ValueError('entry size does not match its pixels')
+    if offset < 0 or offset + length > len(pixels):
+        raise ValueError('pixel data ends at {}, entry needs {}'.format(
+            len(pixels), offset + length))
+
+
+def to_key(value):
+    """JSON turns tuples into lists; frame cache keys need them back"""
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def surface_from_entry(pixels, entry):
+    """Rebuilds a display-format surface from its slice of the pixel data"""
+    offset = entry['offset']
+    if entry['length']:
+        image = pg.image.frombuffer(pixels[offset:offset+entry['length']],
+                                    entry['size'], PIXEL_FORMAT)
+    else:
+        # Mario's zero sized placeholder frame
+        image = pg.Surface(entry['size'])
+    if entry['alpha']:
+        return image.convert_alpha()
+    image = image.convert()
+    if entry['surface_colorkey'] is not None:
+        image.set_colorkey(entry['surface_colorkey'])
+    return image
+
+
+def pixel_entry(surface, pixels):
+    """Appends the pixels of surface to pixels and returns its index entry"""
+    data = pg.image.tobytes(surface, PIXEL_FORMAT)
+    colorkey = surface.get_colorkey()
+    entry = {'size': list(surface.get_size()),
+             'alpha': bool(surface.get_masks()[3]),
+             'surface_colorkey': list(colorkey) if colorkey else None,
+             'offset': len(pixels),
+             'length': len(data)}
+    pixels.extend(data)
+    return entry
+
+
+def write_bake(graphics, directory, path=BAKE_PATH):
+    """Writes the sheets in graphics and every frame currently in the
+    shared frame cache that was cut from one of them"""
+    names = dict((sheet, name) for name, sheet in graphics.items())
+    pixels = bytearray()
+    sheets = dict((name, pixel_entry(sheet, pixels))
+                  for name, sheet in graphics.items())
+
+    frames = []
+    frame_numbers = {}
+    flips = []
+    for key, frame in tools.frame_cache.items():
+        if len(key) == 3:
+            flips.append((key, frame))
+            continue
+        sheet, rect, scale, colorkey, flip = key
+        if sheet not in names:
+            continue
+        entry = pixel_entry(frame, pixels)
+        entry.update(sheet=names[sheet], rect=rect, scale=scale,
+                     colorkey=colorkey, flip=flip)
+        frame_numbers[frame] = len(frames)
+        frames.append(entry)
+
+    for (source, flip_x, flip_y), frame in flips:
+        if source not in frame_numbers:
+            continue
+        entry = pixel_entry(frame, pixels)
+        entry.update(flip_of=frame_numbers[source], flip=[flip_x, flip_y])
+        frames.append(entry)
+
+    index = {'version': BAKE_VERSION,
+             'sources': source_stamps(directory),
+             'sheets': sheets,
+             'frames': frames}
+    index_data = json.dumps(index).encode('utf-8')
+
+    if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    # Written next to the bake and moved over it, so an interrupted bake
+    # never leaves a truncated file behind
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as bake_file:
+            bake_file.write(MAGIC)
+            bake_file.write(struct.pack('<I', len(index_data)))
+            bake_file.write(index_data)
+            bake_file.write(pixels)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return len(frames)
+
+
+def warm_up():
+    """Creates every state and component once so that the frame cache
+    holds all the frames the game cuts during play"""
+    from . import headless
+    from .components import (bricks, castle_flag, coin, flagpole,
+                             powerups, score)
+
+    for level in sorted(headless.LEVELS):
+        headless.create_control(level)
+
+    powerups.Mushroom(0, 0)
+    powerups.LifeMushroom(0, 0)
+    powerups.FireFlower(0, 0)
+    powerups.Star(0, 0)
+    powerups.FireBall(0, 0, True)
+    bricks.BrickPiece(0, 0, 0, 0)
+    coin.Coin(0, 0, [])
+    castle_flag.Flag(0, 0)
+    flagpole.Flag(0, 0)
+    flagpole.Pole(0, 0)
+    flagpole.Finial(0, 0)
+    score.Score(0, 0, 100)
+
+
+def main():
+    """Rebuilds the bake from the PNGs"""
+    from . import setup
+    directory = os.path.join('resources', 'graphics')
+    setup.GFX.clear()
+    setup.GFX.update(tools.load_all_gfx(directory))
+    tools.frame_cache.clear()
+
+    warm_up()
+    count = write_bake(setup.GFX, directory)
+    print("baked {} sheets and {} frames into {} ({:.1f} MB)".format(
+        len(setup.GFX), count, BAKE_PATH,
+        os.path.getsize(BAKE_PATH) / 1e6))
@@ -0,0 +1,129 @@
+"""
+Chunked level streaming.
+
+The level is cut into CHUNK_WIDTH wide strips.  The colliders, bricks and
+coin boxes of a strip are only in the level while the camera is within
+CHUNK_LOAD_MARGIN of it.  Strips further than CHUNK_UNLOAD_MARGIN away
+are released: their colliders leave the collision index and the enemies,
+items and coins left in them are killed.  Bricks and coin boxes are only
+set aside, so a broken brick stays broken when Mario walks back.
+
+Memory and startup time then depend on the size of the screen, not on the
+length of the level.  The background is drawn by tilemap.TileMap.
+"""
+
+import pygame as pg
+from . import constants as c
+
+
+def chunk_range(left, right, width=c.CHUNK_WIDTH):
+    """Indexes of the chunks covering x from left up to right"""
+    return range(left // width, (right - 1) // width + 1)
+
+
+def bucket(items, rect_of, width=c.CHUNK_WIDTH):
+    """{chunk index: the items whose rect overlaps that chunk}"""
+    chunks = {}
+    for item in items:
+        rect = rect_of(item)
+        for index in chunk_range(rect.left, max(rect.right, rect.left + 1),
+                                 width):
+            chunks.setdefault(index, []).append(item)
+    return chunks
+
+
+class Chunk(object):
+    """A loaded strip of the level"""
+    def __init__(self, index, area):
+        self.index = index
+        self.area = area
+
+    def owns(self, sprite):
+        """Sprites belong to the chunk their left edge is in"""
+        return self.area.left <= sprite.rect.x < self.area.right
+
+
+class ChunkStream(object):
+    """Loads and releases the chunks of a level around the camera.
+
+    colliders maps chunk indexes to the colliders overlapping each chunk;
+    they go in collider_group while any of their chunks is loaded.  blocks
+    is a list of (group, specs by chunk, factory): the first time a chunk
+    is loaded factory(spec) builds its sprites into group.  Sprites of
+    released_groups are killed with their chunk."""
+    def __init__(self, level_rect, colliders, collider_group, blocks,
+                 released_groups):
+        self.level_rect = level_rect
+        self.colliders = colliders
+        self.collider_group = collider_group
+        self.loaded_colliders = {}
+        self.blocks = blocks
+        self.block_groups = [group for group, specs, factory in blocks]
+        self.released_groups = released_groups
+        self.count = chunk_range(0, level_rect.width).stop
+        self.chunks = {}
+        self.parked = {}
+        self.wanted = None
+
+    def clamp(self, indexes):
+        return range(max(0, indexes.start), min(self.count, indexes.stop))
+
+    def update(self, viewport):
+        """Loads the chunks near viewport and releases those far from it"""
+        wanted = self.clamp(chunk_range(viewport.left - c.CHUNK_LOAD_MARGIN,
+                                        viewport.right + c.CHUNK_LOAD_MARGIN))
+        if wanted == self.wanted:
+            return
+        self.wanted = wanted
+        keep = chunk_range(viewport.left - c.CHUNK_UNLOAD_MARGIN,
+                           viewport.right + c.CHUNK_UNLOAD_MARGIN)
+        for index in sorted(self.chunks):
+            if index not in keep:
+                self.release(index)
+        for index in wanted:
+            if index not in self.chunks:
+                self.load(index)
+
+    def load(self, index):
+        area = pg.Rect(index * c.CHUNK_WIDTH, 0, c.CHUNK_WIDTH,
+                       self.level_rect.height).clip(self.level_rect)
+        self.chunks[index] = Chunk(index, area)
+
+        for collider in self.colliders.get(index, ()):
+            count = self.loaded_colliders.get(collider, 0)
+            if not count:
+                self.collider_group.add(collider)
+            self.loaded_colliders[collider] = count + 1
+
+        parked = self.parked.pop(index, None)
+        if parked is None:
+            for group, specs, factory in self.blocks:
+                group.add([factory(spec) for spec in specs.get(index, ())])
+        else:
+            for group, sprite in parked:
+                group.add(sprite)
+
+    def release(self, index):
+        chunk = self.chunks.pop(index)
+
+        for collider in self.colliders.get(index, ()):
+            count = self.loaded_colliders.pop(collider) - 1
+            if count:
+                self.loaded_colliders[collider] = count
+            else:
+                self.collider_group.remove(collider)
+
+        parked = []
+        for group in self.block_groups:
+            group.reindex()
+            for sprite in group.query(chunk.area):
+                if chunk.owns(sprite):
+                    group.remove(sprite)
+                    parked.append((group, sprite))
+        self.parked[index] = parked
+
+        for group in self.released_groups:
+            group.reindex()
+            for sprite in group.query(chunk.area):
+                if chunk.owns(sprite):
+                    sprite.kill()
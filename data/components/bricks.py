@@ -1,7 +1,7 @@
 __author__ = 'justinarmstrong'
 
 import pygame as pg
-from .. import setup
+from .. import setup, tools
 from .. import constants as c
 from . import powerups
 from . import coin
@@ -36,15 +36,8 @@ class Brick(pg.sprite.Sprite):
 
     def get_image(self, x, y, width, height):
         """Extracts the image from the sprite sheet"""
-        image = pg.Surface([width, height]).convert()
-        rect = image.get_rect()
-
-        image.blit(self.sprite_sheet, (0, 0), (x, y, width, height))
-        image.set_colorkey(c.BLACK)
-        image = pg.transform.scale(image,
-                                   (int(rect.width*c.BRICK_SIZE_MULTIPLIER),
-                                    int(rect.height*c.BRICK_SIZE_MULTIPLIER)))
-        return image
+        return tools.get_frame(self.sprite_sheet, (x, y, width, height),
+                               c.BRICK_SIZE_MULTIPLIER)
 
 
     def setup_frames(self):
@@ -153,7 +146,7 @@ class BrickPiece(pg.sprite.Sprite):
         self.frames = []
 
         image = self.get_image(68, 20, 8, 8)
-        reversed_image = pg.transform.flip(image, True, False)
+        reversed_image = tools.flip_frame(image, True, False)
 
         self.frames.append(image)
         self.frames.append(reversed_image)
@@ -161,15 +154,8 @@ class BrickPiece(pg.sprite.Sprite):
 
     def get_image(self, x, y, width, height):
         """Extract image from sprite sheet"""
-        image = pg.Surface([width, height]).convert()
-        rect = image.get_rect()
-
-        image.blit(self.sprite_sheet, (0, 0), (x, y, width, height))
-        image.set_colorkey(c.BLACK)
-        image = pg.transform.scale(image,
-                                   (int(rect.width*c.BRICK_SIZE_MULTIPLIER),
-                                    int(rect.height*c.BRICK_SIZE_MULTIPLIER)))
-        return image
+        return tools.get_frame(self.sprite_sheet, (x, y, width, height),
+                               c.BRICK_SIZE_MULTIPLIER)
 
 
     def update(self):
@@ -3,19 +3,45 @@ __author__ = 'justinarmstrong'
 import pygame as pg
 from .. import constants as c
 
+# What happens when Mario reaches a checkpoint
+SPAWN_ENEMIES = 0
+FLAG_POLE = 1
+ENTER_CASTLE = 2
+SECRET_MUSHROOM = 3
+
 
 class Checkpoint(pg.sprite.Sprite):
     """Invisible sprite used to add enemies, special boxes
-    and trigger sliding down the flag pole"""
-    def __init__(self, x, name, y=0, width=10, height=600):
+    and trigger sliding down the flag pole.  Never drawn, so it has a
+    rect but no image.  action is one of the constants above, value its
+    argument (the enemy group to spawn); autosave saves the game when the
+    checkpoint is reached."""
+    def __init__(self, x, name, y=0, width=10, height=600,
+                 action=SPAWN_ENEMIES, value=None, autosave=False):
         super(Checkpoint, self).__init__()
-        self.image = pg.Surface((width, height))
-        self.image.fill(c.BLACK)
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
+        self.rect = pg.Rect(x, y, width, height)
         self.name = name
+        self.action = action
+        self.value = value
+        self.autosave = autosave
 
 
+class TriggerQueue(object):
+    """Full height checkpoints sorted by x.  Mario meets them from left to
+    right, so each frame only the next one is compared with his position."""
+    def __init__(self, checkpoints):
+        self.checkpoints = sorted(checkpoints, key=lambda point: point.rect.x)
+        self.next = 0
 
-
+    def reached(self, rect):
+        """Removes and returns the checkpoints rect has run into.  Ones it
+        is already past without touching (after loading a save) are
+        dropped."""
+        reached = []
+        while (self.next < len(self.checkpoints) and
+               rect.right > self.checkpoints[self.next].rect.left):
+            checkpoint = self.checkpoints[self.next]
+            self.next += 1
+            if rect.left < checkpoint.rect.right:
+                reached.append(checkpoint)
+        return reached
@@ -5,13 +5,11 @@ from .. import constants as c
 
 class Collider(pg.sprite.Sprite):
     """Invisible sprites placed overtop background parts
-    that can be collided with (pipes, steps, ground, etc."""
+    that can be collided with (pipes, steps, ground, etc.  They are never
+    drawn, so only a rect is kept, no image."""
     def __init__(self, x, y, width, height, name='collider'):
         pg.sprite.Sprite.__init__(self)
-        self.image = pg.Surface((width, height)).convert()
-        #self.image.fill(c.RED)
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
+        self.rect = pg.Rect(x, y, width, height)
+        self.name = name
         self.state = None
 
@@ -1,7 +1,7 @@
 __author__ = 'justinarmstrong'
 
 import pygame as pg
-from .. import setup
+from .. import setup, tools
 from .. import constants as c
 from .mario import Mario
 from .powerups import *
@@ -39,14 +39,8 @@ class Enemy(pg.sprite.Sprite):
         self.y_vel = 0
 
     def get_image(self, x, y, width, height):
-        image = pg.Surface([width, height]).convert()
-        rect = image.get_rect()
-        image.blit(self.sprite_sheet, (0, 0), (x, y, width, height))
-        image.set_colorkey(c.BLACK)
-        image = pg.transform.scale(image,
-                                   (int(rect.width * c.SIZE_MULTIPLIER),
-                                    int(rect.height * c.SIZE_MULTIPLIER)))
-        return image
+        return tools.get_frame(self.sprite_sheet, (x, y, width, height),
+                               c.SIZE_MULTIPLIER)
 
     def handle_state(self):
         if self.state == c.WALK:
@@ -130,9 +124,12 @@ class Enemy(pg.sprite.Sprite):
                 self.kill()
                 return
 
-        if platforms:
+        # Level1 的 sprites_about_to_die_group 会把 viewport(Rect) 传进来，
+        # 这时不做碰撞，被踩扁的敌人留在原地
+        viewport = isinstance(platforms, pg.Rect)
+        if platforms and not viewport:
             self.check_collision(platforms)
-        else:
+        elif not (viewport and self.state == c.JUMPED_ON):
             self.rect.x += self.x_vel
             self.rect.y += self.y_vel
             self.y_vel += self.gravity
@@ -152,7 +149,7 @@ class Goomba(Enemy):
         self.frames.append(self.get_image(0, 4, 16, 16))
         self.frames.append(self.get_image(30, 4, 16, 16))
         self.frames.append(self.get_image(61, 0, 16, 16))
-        self.frames.append(pg.transform.flip(self.frames[1], False, True))
+        self.frames.append(tools.flip_frame(self.frames[1], False, True))
 
     def jumped_on(self):
         self.frame_index = 2
@@ -174,7 +171,7 @@ class Koopa(Enemy):
         self.frames.append(self.get_image(150, 0, 16, 24))
         self.frames.append(self.get_image(180, 0, 16, 24))
         self.frames.append(self.get_image(360, 5, 16, 15))
-        self.frames.append(pg.transform.flip(self.frames[2], False, True))
+        self.frames.append(tools.flip_frame(self.frames[2], False, True))
 
     def jumped_on(self):
         self.x_vel = 0
@@ -248,9 +245,6 @@ class boss(Enemy):
         width = int(boss_orig_width * scale_factor)
         height = int(boss_orig_height * scale_factor)
 
-        def resize(frame):
-            return pg.transform.scale(frame, (width, height))
-
         actions = {
             'idle': 'boss_stand',
             'walk': 'boss_walk',
@@ -265,7 +259,9 @@ class boss(Enemy):
             self.sprite_sheet = setup.GFX[sheet_name]
 
             try:
-                frame = resize(self.sprite_sheet)
+                frame = tools.get_frame(self.sprite_sheet,
+                                        self.sprite_sheet.get_rect(),
+                                        (width, height), None)
             except Exception as e:
                 print(f"[Boss Debug] Failed to resize frame {sheet_name}: {e}")
                 frame = pg.Surface((1, 1), pg.SRCALPHA)
@@ -273,7 +269,7 @@ class boss(Enemy):
             # 三帧循环: 站立 - 动作 - 站立
             frames = [frame, frame, frame]
             self.all_frames[f'{action}_left'] = frames
-            self.all_frames[f'{action}_right'] = [pg.transform.flip(f, True, False) for f in frames]
+            self.all_frames[f'{action}_right'] = [tools.flip_frame(f, True, False) for f in frames]
 
         # 设置默认动画
         self.set_animation('idle', once=False)
@@ -1,7 +1,7 @@
 __author__ = 'justinarmstrong'
 
 import pygame as pg
-from .. import setup
+from .. import setup, tools, render
 from .. import constants as c
 from . import flashing_coin
 
@@ -98,15 +98,8 @@ class OverheadInfo(object):
 
     def get_image(self, x, y, width, height):
         """Extracts image from sprite sheet"""
-        image = pg.Surface([width, height])
-        rect = image.get_rect()
-
-        image.blit(self.sprite_sheet, (0, 0), (x, y, width, height))
-        image.set_colorkey((92, 148, 252))
-        image = pg.transform.scale(image,
-                                   (int(rect.width*2.9),
-                                    int(rect.height*2.9)))
-        return image
+        return tools.get_frame(self.sprite_sheet, (x, y, width, height),
+                               2.9, (92, 148, 252))
 
 
     def create_score_group(self):
@@ -400,20 +393,18 @@ class OverheadInfo(object):
 
     def draw_level_screen_info(self, surface):
         """Draws info during regular game play"""
-        for info in self.score_images:
-            surface.blit(info.image, info.rect)
+        for image, position in self.level_screen_images():
+            surface.blit(image, position)
 
-        for digit in self.count_down_images:
-                surface.blit(digit.image, digit.rect)
-
-        for character in self.coin_count_images:
-            surface.blit(character.image, character.rect)
 
+    def level_screen_images(self):
+        """(image, position) pairs drawn during regular game play"""
+        sprites = (self.score_images + self.count_down_images +
+                   self.coin_count_images)
         for label in self.label_list:
-            for letter in label:
-                surface.blit(letter.image, letter.rect)
-
-        surface.blit(self.flashing_coin.image, self.flashing_coin.rect)
+            sprites.extend(label)
+        sprites.append(self.flashing_coin)
+        return render.sprite_images(sprites)
 
 
     def draw_game_over_screen_info(self, surface):
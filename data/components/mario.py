@@ -298,39 +298,39 @@ class Mario(pg.sprite.Sprite):
         #frames but are simply reversed.
 
         for frame in self.right_small_normal_frames:
-            new_image = pg.transform.flip(frame, True, False)
+            new_image = tools.flip_frame(frame, True, False)
             self.left_small_normal_frames.append(new_image)
 
         for frame in self.right_small_green_frames:
-            new_image = pg.transform.flip(frame, True, False)
+            new_image = tools.flip_frame(frame, True, False)
             self.left_small_green_frames.append(new_image)
 
         for frame in self.right_small_red_frames:
-            new_image = pg.transform.flip(frame, True, False)
+            new_image = tools.flip_frame(frame, True, False)
             self.left_small_red_frames.append(new_image)
 
         for frame in self.right_small_black_frames:
-            new_image = pg.transform.flip(frame, True, False)
+            new_image = tools.flip_frame(frame, True, False)
             self.left_small_black_frames.append(new_image)
 
         for frame in self.right_big_normal_frames:
-            new_image = pg.transform.flip(frame, True, False)
+            new_image = tools.flip_frame(frame, True, False)
             self.left_big_normal_frames.append(new_image)
 
         for frame in self.right_big_green_frames:
-            new_image = pg.transform.flip(frame, True, False)
+            new_image = tools.flip_frame(frame, True, False)
             self.left_big_green_frames.append(new_image)
 
         for frame in self.right_big_red_frames:
-            new_image = pg.transform.flip(frame, True, False)
+            new_image = tools.flip_frame(frame, True, False)
             self.left_big_red_frames.append(new_image)
 
         for frame in self.right_big_black_frames:
-            new_image = pg.transform.flip(frame, True, False)
+            new_image = tools.flip_frame(frame, True, False)
             self.left_big_black_frames.append(new_image)
 
         for frame in self.right_fire_frames:
-            new_image = pg.transform.flip(frame, True, False)
+            new_image = tools.flip_frame(frame, True, False)
             self.left_fire_frames.append(new_image)
 
 
@@ -388,6 +388,12 @@ class Mario(pg.sprite.Sprite):
                            self.left_small_green_frames,
                            self.left_small_black_frames]
 
+        # Frames are shared with earlier Marios, which may have been
+        # removed halfway through the hurt flicker.
+        for frames in self.all_images + self.fire_frames:
+            for image in frames:
+                image.set_alpha(255)
+
 
         self.right_frames = self.normal_small_frames[0]
         self.left_frames = self.normal_small_frames[1]
@@ -395,15 +401,8 @@ class Mario(pg.sprite.Sprite):
 
     def get_image(self, x, y, width, height):
         """Extracts image from sprite sheet"""
-        image = pg.Surface([width, height])
-        rect = image.get_rect()
-
-        image.blit(self.sprite_sheet, (0, 0), (x, y, width, height))
-        image.set_colorkey(c.BLACK)
-        image = pg.transform.scale(image,
-                                   (int(rect.width*c.SIZE_MULTIPLIER),
-                                    int(rect.height*c.SIZE_MULTIPLIER)))
-        return image
+        return tools.get_frame(self.sprite_sheet, (x, y, width, height),
+                               c.SIZE_MULTIPLIER)
 
 
     def update(self, keys, game_info, fire_group):
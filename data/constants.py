@@ -34,6 +34,19 @@ BRICK_SIZE_MULTIPLIER = 2.69
 BACKGROUND_MULTIPLER = 2.679
 GROUND_HEIGHT = SCREEN_HEIGHT - 62
 
+# Sprites this far outside the viewport are still drawn
+DRAW_MARGIN = 50
+# Enemies, shells, powerups and blocks further than this from the viewport
+# are frozen.  Wider than the 500 pixels at which sliding shells are removed.
+ACTIVE_MARGIN = 600
+# Levels are streamed in strips this wide.  A strip is loaded when the
+# viewport comes within CHUNK_LOAD_MARGIN of it (further than the frozen
+# sprites, so everything that moves has ground under it) and released when
+# it is more than CHUNK_UNLOAD_MARGIN away.
+CHUNK_WIDTH = 1024
+CHUNK_LOAD_MARGIN = ACTIVE_MARGIN + 200
+CHUNK_UNLOAD_MARGIN = CHUNK_LOAD_MARGIN + CHUNK_WIDTH
+
 #MARIO FORCES
 WALK_ACCEL = .15
 RUN_ACCEL = 20
@@ -0,0 +1,188 @@
+"""
+Reinforcement learning style environment around a level.
+
+    from data.env import MarioEnv
+    env = MarioEnv(level=1, frame_skip=4)
+    observation = env.reset(seed=0)
+    while True:
+        observation, reward, done, info = env.step(env.action_index('right', 'jump'))
+        if done:
+            break
+
+MarioEnv skips the menus and load screens: reset() calls the level's
+startup() with a fresh game_info and step() calls its update() with the
+keys of the chosen action, moving the game clock on one tick at a time.
+The level only draws if the environment was made with rendering=True, so
+without it a step costs no more than a headless tick.
+Checkpoint autosaves are off, so environments never touch the save
+files.
+
+The observation is a dict of where Mario and the enemies are, or with
+observation='screen' the rendered screen and with observation='tiles' a
+grid of what is in each cell of the viewport, both NumPy arrays from
+observation.py.  Arrays are reused by the next step; copy them to keep
+them.
+
+An episode ends when Mario dies, reaches the castle, the level finishes or
+max_ticks ticks have run.  The reward is the progress to the right in
+pixels plus the score gained times SCORE_REWARD.
+
+Importing this module before the rest of the game picks the dummy SDL
+drivers, as mario_headless.py does.
+"""
+
+import os
+
+os.environ.setdefault('MARIO_HEADLESS', '1')
+
+from . import headless, tools, observation as observations
+from . import constants as c
+
+# The key combinations an agent chooses from, by index
+ACTIONS = ((),
+           ('right',),
+           ('right', 'jump'),
+           ('right', 'action'),
+           ('right', 'jump', 'action'),
+           ('left',),
+           ('left', 'jump'),
+           ('left', 'action'),
+           ('jump',),
+           ('down',))
+
+SCORE_REWARD = 0.01
+
+
+def new_game_info():
+    """game_info of a new game, as the main menu starts it"""
+    return {c.COIN_TOTAL: 0,
+            c.SCORE: 0,
+            c.LIVES: 3,
+            c.TOP_SCORE: 0,
+            c.CURRENT_TIME: 0.0,
+            c.LEVEL_STATE: None,
+            c.CAMERA_START_X: 0,
+            c.MARIO_DEAD: False}
+
+
+class MarioEnv(object):
+    """One level, stepped by actions.  frame_skip is the number of ticks
+    an action is held for; max_ticks (None for no limit) cuts episodes
+    short.  observation is 'state', 'screen' (which renders, with
+    grayscale and downsample options) or 'tiles'."""
+    def __init__(self, level=1, frame_skip=1, rendering=False, seed=None,
+                 max_ticks=None, observation='state', grayscale=False,
+                 downsample=1, tile_size=observations.TILE_SIZE):
+        self.level_number = level
+        self.frame_skip = frame_skip
+        self.rendering = rendering or observation == 'screen'
+        self.max_ticks = max_ticks
+        self.observation = observation
+        self.control = headless.create_control(level, self.rendering, seed)
+        self.level = self.control.state
+        screen_size = self.control.screen.get_size()
+        if observation == 'screen':
+            self.observer = observations.ScreenObserver(
+                screen_size, grayscale, downsample)
+        elif observation == 'tiles':
+            self.observer = observations.TileObserver(screen_size, tile_size)
+        elif observation == 'state':
+            self.observer = None
+        else:
+            raise ValueError('unknown observation {!r}'.format(observation))
+        self.key_states = [tools.KeyState.from_actions(*action)
+                           for action in ACTIONS]
+        self.episode_ticks = 0
+        self.last_x = 0
+        self.last_score = 0
+
+    @property
+    def action_count(self):
+        return len(ACTIONS)
+
+    def action_index(self, *actions):
+        """The index of the action holding the given keybinding names"""
+        return ACTIONS.index(tuple(actions))
+
+    def seed(self, seed):
+        self.control.seed(seed)
+
+    def reset(self, seed=None):
+        """Starts a new episode at the beginning of the level and returns
+        the first observation"""
+        if seed is not None:
+            self.seed(seed)
+        self.level.done = False
+        self.level.startup(self.control.game_clock.time, new_game_info())
+        if self.rendering:
+            self.level.rendering = True
+            self.level.blit_everything(self.control.screen)
+        self.episode_ticks = 0
+        self.last_x = self.level.mario.rect.x
+        self.last_score = self.level.game_info[c.SCORE]
+        return self.observe()
+
+    def step(self, action):
+        """Holds action (an index into ACTIONS, or a tools.KeyState) for
+        frame_skip ticks.  Returns (observation, reward, done, info)."""
+        if isinstance(action, tools.KeyState):
+            keys = action
+        else:
+            keys = self.key_states[action]
+        clock = self.control.game_clock
+        done = False
+        for tick in range(self.frame_skip):
+            clock.advance()
+            self.episode_ticks += 1
+            last = tick == self.frame_skip - 1
+            self.level.rendering = self.rendering and last
+            self.level.update(self.control.screen, keys, clock.time)
+            done = self.finished()
+            if done:
+                break
+
+        mario = self.level.mario
+        score = self.level.game_info[c.SCORE]
+        reward = (mario.rect.x - self.last_x +
+                  (score - self.last_score) * SCORE_REWARD)
+        self.last_x = mario.rect.x
+        self.last_score = score
+        return self.observe(), reward, done, self.info()
+
+    def finished(self):
+        mario = self.level.mario
+        if mario.dead or mario.in_castle or self.level.done:
+            return True
+        return (self.max_ticks is not None and
+                self.episode_ticks >= self.max_ticks)
+
+    def observe(self):
+        if self.observation == 'screen':
+            return self.observer.observe(self.control.screen)
+        if self.observation == 'tiles':
+            return self.observer.observe(self.level)
+        return self.observe_state()
+
+    def observe_state(self):
+        """Where Mario and the enemies near him are"""
+        level = self.level
+        mario = level.mario
+        enemies = tuple(enemy.rect.topleft for enemy in level.enemy_group
+                        if enemy.rect.colliderect(level.viewport))
+        return {'x': mario.rect.x,
+                'y': mario.rect.y,
+                'x_vel': mario.x_vel,
+                'y_vel': mario.y_vel,
+                'big': mario.big,
+                'viewport_x': level.viewport.x,
+                'enemies': enemies}
+
+    def info(self):
+        game_info = self.level.game_info
+        mario = self.level.mario
+        return {'ticks': self.episode_ticks,
+                'score': game_info[c.SCORE],
+                'coins': game_info[c.COIN_TOTAL],
+                'x': mario.rect.x,
+                'dead': mario.dead,
+                'in_castle': mario.in_castle}
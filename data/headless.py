@@ -0,0 +1,124 @@
+"""
+Runs a level without a window, sound or frame cap.  Import data through
+mario_headless.py (or set MARIO_HEADLESS=1 first) so that setup picks the
+dummy SDL drivers.
+"""
+
+import argparse
+import pygame as pg
+from . import setup, tools, replay
+from .states import main_menu, load_screen, level1, level2
+from . import constants as c
+
+LEVELS = {1: level1.Level1,
+          2: level2.Level2}
+
+
+def create_control(level=1, rendering=False, seed=None):
+    """Builds a Control that starts directly in the given level, or in
+    the main menu (with Level1 behind it) if level is None.  Checkpoint
+    autosaves are turned off, so runs never write to the save files."""
+    control = tools.Control(setup.ORIGINAL_CAPTION, rendering)
+    state_dict = {c.MAIN_MENU: main_menu.Menu(),
+                  c.LOAD_SCREEN: load_screen.LoadScreen(),
+                  c.TIME_OUT: load_screen.TimeOut(),
+                  c.GAME_OVER: load_screen.GameOver(),
+                  c.LEVEL1: LEVELS[level or 1]()}
+    state_dict[c.LEVEL1].autosave_enabled = False
+
+    control.setup_states(state_dict, c.MAIN_MENU)
+    if seed is not None:
+        control.seed(seed)
+    if level is not None:
+        control.state.next = c.LEVEL1
+        control.flip_state()
+    return control
+
+
+def run_right_policy(control):
+    """Holds right and taps jump, enough to move through most of 1-1"""
+    if control.game_clock.ticks % 50 < 35:
+        return tools.KeyState.from_actions('right', 'jump')
+    return tools.KeyState.from_actions('right')
+
+
+def check_resets(control, resets):
+    """Restarts the current level resets times, one tick each.  Its
+    colliders are shared by every life, so each has to stay in as many
+    groups as before.  Returns (collider, groups before, groups after) for
+    every collider that did not."""
+    state = control.state
+    level_data = getattr(state, 'level_data', None)
+    if level_data is None:
+        return []
+    before = dict((collider, len(collider.groups()))
+                  for collider in level_data.collider_rank)
+    for restart in range(resets):
+        state.startup(control.game_clock.time, state.game_info)
+        control.step()
+    return [(collider, count, len(collider.groups()))
+            for collider, count in before.items()
+            if len(collider.groups()) != count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--level', type=int, choices=sorted(LEVELS), default=1)
+    parser.add_argument('--ticks', type=int, default=6000,
+                        help='number of game ticks to simulate')
+    parser.add_argument('--render', action='store_true',
+                        help='draw every tick to the off-screen display')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the per-section time of the last ticks')
+    parser.add_argument('--seed', type=int,
+                        help='seed for the random terrain of level 2')
+    parser.add_argument('--record', metavar='PATH',
+                        help='save the keys of every tick as a replay')
+    parser.add_argument('--replay', metavar='PATH',
+                        help='play a replay back instead of the built-in '
+                             'policy; --level, --ticks and --seed are ignored')
+    parser.add_argument('--check-resets', type=int, metavar='N',
+                        help='restart the level N times and check that its '
+                             'colliders are not left in old groups')
+    args = parser.parse_args(argv)
+
+    if not setup.HEADLESS:
+        print("warning: MARIO_HEADLESS is not set, a real display is in use")
+
+    if args.replay:
+        recording = replay.Replay.load(args.replay)
+        level, ticks, seed = recording.level, recording.ticks, recording.seed
+        policy = replay.Player(recording)
+    else:
+        level, ticks, seed = args.level, args.ticks, args.seed
+        policy = run_right_policy
+    if seed is None and args.record:
+        seed = replay.new_seed()
+
+    control = create_control(level, args.render, seed)
+    if args.replay:
+        control.game_clock.tick_rate = recording.tick_rate
+    if args.record:
+        control.recorder = replay.Recorder(seed, level,
+                                           control.game_clock.tick_rate)
+    if args.check_resets:
+        leaked = check_resets(control, args.check_resets)
+        for collider, before, after in leaked:
+            print('collider {} was in {} groups, now {}'.format(
+                collider.rect, before, after))
+        if leaked:
+            raise SystemExit(1)
+        print('{} restarts, no colliders leaked'.format(args.check_resets))
+    if args.profile:
+        control.profiler.toggle(control)
+    control.run_headless(ticks, policy)
+    if args.record:
+        control.recorder.save(args.record)
+    if args.replay:
+        print(replay.summary(control))
+    if args.profile:
+        # Averages over the whole run.  run_headless has no event loop.
+        print('{:<16}{:>8}{:>9}'.format('section', 'avg ms', 'max ms'))
+        for label, average, peak in control.profiler.run_summary(
+                skip=('event_loop',)):
+            print('{:<16}{:>8.2f}{:>9.2f}'.format(label, average, peak))
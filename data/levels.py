@@ -0,0 +1,120 @@
+"""
+Level files.
+
+resources/levels/<name>.json describes a level: the invisible ground,
+pipe and step colliders, the bricks and coin boxes with their contents,
+the flag pole, the enemy groups, the checkpoints and where the camera
+starts.  load() parses a file and compiles it once; every life in the
+level reuses the result.
+
+Colliders and checkpoints never change during play, so they are built
+once and shared.  Bricks, coin boxes and enemies are knocked about, so
+only their specs are kept and the level builds fresh sprites from them
+for each life.  Colliders and block specs are also bucketed by chunk for
+chunks.ChunkStream.
+"""
+
+import json
+import os
+import pygame as pg
+from . import constants as c
+from . import chunks
+from .components import checkpoint, collider, enemies
+
+LEVEL_DIRECTORY = os.path.join('resources', 'levels')
+
+ACTIONS = {'spawn_enemies': checkpoint.SPAWN_ENEMIES,
+           'flag_pole': checkpoint.FLAG_POLE,
+           'enter_castle': checkpoint.ENTER_CASTLE,
+           'secret_mushroom': checkpoint.SECRET_MUSHROOM}
+
+ENEMIES = {'goomba': enemies.Goomba,
+           'koopa': enemies.Koopa}
+
+_compiled = {}
+
+
+def load(name, directory=LEVEL_DIRECTORY):
+    """The compiled level in <directory>/<name>.json, parsed only the
+    first time"""
+    path = os.path.join(directory, name + '.json')
+    level = _compiled.get(path)
+    if level is None:
+        with open(path) as level_file:
+            level = CompiledLevel(json.load(level_file))
+        _compiled[path] = level
+    return level
+
+
+class CompiledLevel(object):
+    """A parsed level file, ready for Level1 to build a life from"""
+    def __init__(self, data):
+        self.background = data['background']['image']
+        self.background_scale = data['background']['scale']
+
+        camera = data['camera']
+        self.camera_start_x = camera['start_x']
+        # Dying past restart_after_x restarts the level from restart_x
+        self.restart_after_x = camera['restart_after_x']
+        self.restart_x = camera['restart_x']
+
+        self.ground = [collider.Collider(*rect) for rect in data['ground']]
+        self.pipes = [collider.Collider(*rect) for rect in data['pipes']]
+        self.steps = [collider.Collider(*rect) for rect in data['steps']]
+        colliders = self.ground + self.pipes + self.steps
+        # Collision checks take the first collider hit in this order
+        self.collider_rank = dict((collider, rank) for rank, collider
+                                  in enumerate(colliders))
+        self.chunk_colliders = chunks.bucket(colliders,
+                                             lambda collider: collider.rect)
+
+        # [x, y] or [x, y, contents]
+        self.bricks = []
+        for brick in data['bricks']:
+            contents = brick[2] if len(brick) > 2 else None
+            self.bricks.append((brick[0], brick[1], contents))
+        self.coin_boxes = [tuple(box) for box in data['coin_boxes']]
+        self.chunk_bricks = self.bucket_blocks(self.bricks)
+        self.chunk_coin_boxes = self.bucket_blocks(self.coin_boxes)
+
+        flag = data['flag']
+        self.flag = tuple(flag['flag'])
+        self.finial = tuple(flag['finial'])
+        self.poles = [tuple(pole) for pole in flag['poles']]
+        self.flag_score_x = flag['score_x']
+        # Raised over the castle once the level is finished
+        self.castle_flag = tuple(flag['castle_flag'])
+
+        self.enemy_groups = []
+        for group in data['enemy_groups']:
+            specs = []
+            for enemy in group:
+                options = dict(enemy)
+                specs.append((ENEMIES[options.pop('type')], options))
+            self.enemy_groups.append(specs)
+
+        lines = []
+        self.boxes = []
+        for point in data['checkpoints']:
+            point = self.compile_checkpoint(point)
+            # Full height checkpoints go in the TriggerQueue, the others
+            # are tested against Mario's rect
+            if point.rect.height >= c.SCREEN_HEIGHT:
+                lines.append(point)
+            else:
+                self.boxes.append(point)
+        self.lines = sorted(lines, key=lambda point: point.rect.x)
+
+    def bucket_blocks(self, specs):
+        """Blocks belong to the chunk their left edge is in"""
+        return chunks.bucket(specs, lambda spec: pg.Rect(spec[0], spec[1],
+                                                         1, 1))
+
+    def compile_checkpoint(self, point):
+        return checkpoint.Checkpoint(
+            point['x'], point['name'],
+            point.get('y', 0), point.get('width', 10),
+            point.get('height', c.SCREEN_HEIGHT),
+            action=ACTIONS[point['action']],
+            value=point.get('group'),
+            autosave=point.get('autosave', False))
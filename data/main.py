@@ -1,6 +1,7 @@
 __author__ = 'justinarmstrong'
 
-from . import setup,tools
+import os
+from . import setup,tools,replay
 from .states import main_menu,load_screen,level1
 from . import constants as c
 
@@ -15,7 +16,15 @@ def main():
                   c.LEVEL1: level1.Level1()}
 
     run_it.setup_states(state_dict, c.MAIN_MENU)
+    # 设置 MARIO_RECORD=文件名 录制整局的按键，可用 mario_headless.py --replay 回放
+    record_path = os.environ.get('MARIO_RECORD')
+    if record_path:
+        seed = replay.new_seed()
+        run_it.seed(seed)
+        run_it.recorder = replay.Recorder(seed, None, run_it.game_clock.tick_rate)
     run_it.main()
+    if record_path:
+        run_it.recorder.save(record_path)
 
 
 
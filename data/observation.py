@@ -0,0 +1,138 @@
+"""
+Observations as NumPy arrays, for agents and analysis tools.
+
+ScreenObserver reads the rendered screen through a pg.surfarray view, so
+the pixels are not copied into a string first, and writes them straight
+into an array allocated once: optionally grayscale, optionally keeping
+only every downsample-th row and column.
+
+TileObserver needs no rendering at all.  It builds a grid of TILE_SIZE
+cells over the viewport from the level's sprite groups, one code per cell
+(EMPTY, SOLID, BRICK...).
+
+Both return the same array every call, overwritten in place; copy it to
+keep it.  NumPy is optional for the game, these need it.
+"""
+
+import pygame as pg
+from . import constants as c
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# One brick
+TILE_SIZE = int(16 * c.BRICK_SIZE_MULTIPLIER)
+
+EMPTY = 0
+SOLID = 1
+BRICK = 2
+COIN_BOX = 3
+POWERUP = 4
+ENEMY = 5
+MARIO = 6
+
+# Level attributes drawn into the tile grid, in order: later ones cover
+# earlier ones.  Levels without an attribute skip it.
+TILE_LAYERS = (('ground_step_pipe_group', SOLID),
+               ('random_terrain_group', SOLID),
+               ('brick_group', BRICK),
+               ('coin_box_group', COIN_BOX),
+               ('powerup_group', POWERUP),
+               ('enemy_group', ENEMY),
+               ('shell_group', ENEMY),
+               ('boss', ENEMY),
+               ('mario', MARIO))
+
+# ITU-R 601 luma weights out of 256
+GRAY_WEIGHTS = (77, 150, 29)
+
+
+def require_numpy():
+    if numpy is None:
+        raise ImportError('array observations need numpy '
+                          '(pip install numpy)')
+
+
+def stack(observations):
+    """observations as one array if they are arrays, else as a list"""
+    if numpy is not None and observations and \
+            isinstance(observations[0], numpy.ndarray):
+        return numpy.stack(observations)
+    return list(observations)
+
+
+class ScreenObserver(object):
+    """The pixels of a surface, (height, width, 3) or (height, width) if
+    grayscale, divided by downsample"""
+    def __init__(self, size, grayscale=False, downsample=1):
+        require_numpy()
+        width, height = size
+        self.grayscale = grayscale
+        self.downsample = downsample
+        shape = (-(-height // downsample), -(-width // downsample))
+        if grayscale:
+            self.buffer = numpy.empty(shape, numpy.uint8)
+            self.luma = numpy.empty(shape, numpy.uint16)
+            self.channel = numpy.empty(shape, numpy.uint16)
+        else:
+            self.buffer = numpy.empty(shape + (3,), numpy.uint8)
+
+    def observe(self, surface):
+        step = self.downsample
+        # pixels3d is indexed [x, y]; the view locks surface until deleted
+        pixels = pg.surfarray.pixels3d(surface)
+        view = pixels.transpose(1, 0, 2)[::step, ::step]
+        if self.grayscale:
+            red, green, blue = GRAY_WEIGHTS
+            numpy.multiply(view[..., 0], red, out=self.luma,
+                           dtype=numpy.uint16)
+            numpy.multiply(view[..., 1], green, out=self.channel,
+                           dtype=numpy.uint16)
+            self.luma += self.channel
+            numpy.multiply(view[..., 2], blue, out=self.channel,
+                           dtype=numpy.uint16)
+            self.luma += self.channel
+            self.luma >>= 8
+            numpy.copyto(self.buffer, self.luma, casting='unsafe')
+        else:
+            numpy.copyto(self.buffer, view)
+        del view, pixels
+        return self.buffer
+
+
+class TileObserver(object):
+    """What is in each tile_size cell of a viewport sized size"""
+    def __init__(self, size, tile_size=TILE_SIZE):
+        require_numpy()
+        width, height = size
+        self.tile_size = tile_size
+        self.buffer = numpy.empty((-(-height // tile_size),
+                                   -(-width // tile_size)), numpy.uint8)
+
+    def sprites(self, level, name):
+        sprites = getattr(level, name, None)
+        if sprites is None:
+            return ()
+        if isinstance(sprites, pg.sprite.Sprite):
+            return (sprites,) if sprites.alive() else ()
+        return sprites
+
+    def observe(self, level):
+        size = self.tile_size
+        viewport = level.viewport
+        rows, columns = self.buffer.shape
+        self.buffer.fill(EMPTY)
+        for name, code in TILE_LAYERS:
+            for sprite in self.sprites(level, name):
+                rect = sprite.rect.clip(viewport)
+                if not rect:
+                    continue
+                left = (rect.left - viewport.left) // size
+                top = (rect.top - viewport.top) // size
+                right = (rect.right - viewport.left - 1) // size + 1
+                bottom = (rect.bottom - viewport.top - 1) // size + 1
+                self.buffer[top:min(bottom, rows),
+                            left:min(right, columns)] = code
+        return self.buffer
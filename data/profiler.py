@@ -0,0 +1,210 @@
+"""
+Per-subsystem frame profiler with an on-screen breakdown (toggle with F3).
+
+While it is off nothing is wrapped, so the game pays a single attribute
+check per frame.  Turning it on replaces the profiled methods on the live
+objects with timing wrappers; turning it off removes them again.
+"""
+
+import time
+from collections import deque
+import pygame as pg
+from . import constants as c
+
+FRAME_BUDGET_MS = 1000.0 / 60
+
+# (label, indent, owner, method names).  Owner is resolved on the Control:
+# 'control', 'state' or an attribute of the state.
+SECTIONS = [
+    ('event_loop', 0, 'control', ['event_loop']),
+    ('handle_states', 0, 'state', ['handle_states']),
+    ('mario', 1, 'state', ['adjust_mario_position']),
+    ('enemies', 1, 'state', ['adjust_enemy_position']),
+    ('shells', 1, 'state', ['adjust_shell_position']),
+    ('powerups', 1, 'state', ['adjust_powerup_position']),
+    ('collisions', 2, 'state', ['check_mario_x_collisions',
+                                'check_mario_y_collisions',
+                                'test_if_mario_is_falling',
+                                'check_enemy_x_collisions',
+                                'check_enemy_y_collisions',
+                                'check_shell_x_collisions',
+                                'check_shell_y_collisions',
+                                'check_mushroom_x_collisions',
+                                'check_mushroom_y_collisions',
+                                'check_star_y_collisions',
+                                'check_fireball_x_collisions',
+                                'check_fireball_y_collisions',
+                                'check_points_check',
+                                'check_boss_collision']),
+    ('blit_everything', 0, 'state', ['blit_everything']),
+    ('overhead_info', 0, 'overhead_info_display', ['update']),
+    ('sound', 0, 'sound_manager', ['update']),
+]
+
+
+class FrameProfiler(object):
+    """Collects the time spent in each section every frame and keeps a
+    rolling history for the overlay, and totals over the whole run for
+    reports"""
+    def __init__(self, history=120):
+        self.enabled = False
+        self.history = history
+        self.section_history = dict((section[0], deque(maxlen=history))
+                                    for section in SECTIONS)
+        self.frame_history = deque(maxlen=history)
+        self.frame_totals = dict.fromkeys(self.section_history, 0.0)
+        self.run_totals = dict.fromkeys(self.section_history, 0.0)
+        self.run_peaks = dict.fromkeys(self.section_history, 0.0)
+        self.run_frames = 0
+        self.active = dict.fromkeys(self.section_history, 0)
+        self.wrapped = []
+        self.frame_start = 0.0
+        self.font = None
+
+
+    def toggle(self, control):
+        """Turns profiling on or off for the given Control"""
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+            self.run_totals = dict.fromkeys(self.section_history, 0.0)
+            self.run_peaks = dict.fromkeys(self.section_history, 0.0)
+            self.run_frames = 0
+            self.attach(control)
+        else:
+            self.detach()
+
+
+    def attach(self, control):
+        """Wraps the profiled methods of the control and its current state.
+        Called again whenever the state or its helpers are replaced."""
+        self.detach()
+        for label, indent, owner_name, method_names in SECTIONS:
+            if owner_name == 'control':
+                owner = control
+            elif owner_name == 'state':
+                owner = control.state
+            else:
+                owner = getattr(control.state, owner_name, None)
+            if owner is None:
+                continue
+            for name in method_names:
+                method = getattr(owner, name, None)
+                if method is not None:
+                    setattr(owner, name, self.timed(label, method))
+                    self.wrapped.append((owner, name))
+
+
+    def detach(self):
+        """Removes every timing wrapper, restoring the class methods"""
+        for owner, name in self.wrapped:
+            owner.__dict__.pop(name, None)
+        self.wrapped = []
+
+
+    def timed(self, label, method):
+        """Returns a wrapper adding the run time of method to label.  Only
+        the outermost call is timed so nested sections aren't counted
+        twice."""
+        def wrapper(*args, **kwargs):
+            if self.active[label]:
+                return method(*args, **kwargs)
+            self.active[label] += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.frame_totals[label] += time.perf_counter() - start
+                self.active[label] -= 1
+        return wrapper
+
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+
+
+    def end_frame(self):
+        """Stores this frame's totals in the history and resets them"""
+        self.frame_history.append(
+            (time.perf_counter() - self.frame_start) * 1000)
+        self.run_frames += 1
+        for label, total in self.frame_totals.items():
+            total_ms = total * 1000
+            self.section_history[label].append(total_ms)
+            self.run_totals[label] += total_ms
+            self.run_peaks[label] = max(self.run_peaks[label], total_ms)
+            self.frame_totals[label] = 0.0
+
+
+    def draw(self, surface):
+        """Draws the rolling breakdown and the frame time graph"""
+        if self.font is None:
+            self.font = pg.font.Font(None, 18)
+
+        width = self.history * 2 + 20
+        height = 20 + 16 * (len(SECTIONS) + 1) + 70
+        panel = pg.Surface((width, height))
+        panel.set_alpha(200)
+        panel.fill(c.BLACK)
+        surface.blit(panel, (0, 0))
+
+        y = 6
+        self.draw_row(surface, y, 'section', 'avg ms', 'max ms', c.WHITE)
+        for label, average, peak in self.summary():
+            y += 16
+            color = c.RED if average > FRAME_BUDGET_MS / 2 else c.WHITE
+            self.draw_row(surface, y, label, '{:.2f}'.format(average),
+                          '{:.2f}'.format(peak), color)
+
+        self.draw_graph(surface, pg.Rect(10, y + 20, self.history * 2, 60))
+
+
+    def summary(self):
+        """Returns (indented label, average ms, max ms) for every section"""
+        lines = []
+        for label, indent, owner, names in SECTIONS:
+            samples = self.section_history[label]
+            if samples:
+                average = sum(samples) / len(samples)
+                peak = max(samples)
+            else:
+                average = peak = 0.0
+            lines.append(('  ' * indent + label, average, peak))
+        return lines
+
+
+    def run_summary(self, skip=()):
+        """Like summary(), averaged over every frame since profiling was
+        turned on instead of the recent history.  Sections in skip are
+        left out."""
+        lines = []
+        for label, indent, owner, names in SECTIONS:
+            if label in skip:
+                continue
+            average = self.run_totals[label] / max(1, self.run_frames)
+            lines.append(('  ' * indent + label, average,
+                          self.run_peaks[label]))
+        return lines
+
+
+    def draw_row(self, surface, y, label, average, peak, color):
+        """Draws a label with two right aligned columns"""
+        surface.blit(self.font.render(label, True, color), (8, y))
+        for text, right in ((average, 180), (peak, 240)):
+            image = self.font.render(text, True, color)
+            surface.blit(image, image.get_rect(topright=(right, y)))
+
+
+    def draw_graph(self, surface, rect):
+        """Bar graph of recent frame times; the line marks 16.6 ms"""
+        pg.draw.rect(surface, c.GRAY, rect, 1)
+        scale = rect.height / (FRAME_BUDGET_MS * 2)
+        for i, frame_ms in enumerate(self.frame_history):
+            bar = min(rect.height, int(frame_ms * scale))
+            color = c.GREEN if frame_ms <= FRAME_BUDGET_MS else c.RED
+            x = rect.x + i * 2
+            pg.draw.line(surface, color, (x, rect.bottom - 1),
+                         (x, rect.bottom - bar))
+        budget_y = rect.bottom - int(FRAME_BUDGET_MS * scale)
+        pg.draw.line(surface, c.YELLOW, (rect.x, budget_y),
+                     (rect.right, budget_y))
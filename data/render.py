@@ -0,0 +1,140 @@
+"""
+Dirty rectangle rendering.
+
+A frame is described as a list of (image, position) pairs in draw order.
+DirtyTracker compares it with the previous frame and reports the areas
+that changed; only those areas are redrawn and sent to the display.
+Pairs are compared by value, so a HUD digit that is rebuilt every tick
+but looks the same does not count as a change.
+"""
+
+import pygame as pg
+
+
+def sprite_images(sprites):
+    """(image, position) pairs for sprites, the way Group.draw blits them"""
+    return [(sprite.image, sprite.rect.topleft) for sprite in sprites]
+
+
+class DirtyTracker(object):
+    """Remembers what was drawn last frame"""
+    def __init__(self):
+        self.drawn = set()
+
+    def reset(self):
+        """Forget the last frame, e.g. after a full redraw elsewhere"""
+        self.drawn = set()
+
+    def collect(self, images):
+        """Records this frame's images and returns the rects of everything
+        that appeared, moved, changed alpha or went away"""
+        drawn = set((image, tuple(position), image.get_alpha())
+                    for image, position in images)
+        changed = [pg.Rect(position, image.get_size())
+                   for image, position, alpha in drawn ^ self.drawn]
+        self.drawn = drawn
+        return changed
+
+
+def merge_rects(rects):
+    """Joins overlapping rects so no pixel is redrawn twice.  Empty rects
+    are dropped."""
+    merged = []
+    for rect in rects:
+        rect = pg.Rect(rect)
+        if not rect.w or not rect.h:
+            continue
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+def redraw(surface, images, rects, offset=(0, 0)):
+    """Blits the images in order, but only the parts inside rects.  offset
+    is the position of the surface's top left corner in the coordinates
+    of the images."""
+    offset_x, offset_y = offset
+    for image, (x, y) in images:
+        area = pg.Rect((x - offset_x, y - offset_y), image.get_size())
+        for index in area.collidelistall(rects):
+            clip = area.clip(rects[index])
+            surface.blit(image, clip, clip.move(-area.x, -area.y))
+
+
+def scroll(surface, shown, viewport):
+    """Scrolls surface, which shows the shown part of the level, to show
+    viewport instead.  Returns the area (level coordinates) that still has
+    to be drawn: the columns uncovered, all of viewport if nothing could
+    be kept, or None if the camera did not move."""
+    if (shown is None or shown.y != viewport.y or
+            abs(viewport.x - shown.x) >= viewport.width):
+        return pg.Rect(viewport)
+    moved = viewport.x - shown.x
+    if not moved:
+        return None
+    surface.scroll(-moved, 0)
+    if moved > 0:
+        return pg.Rect(viewport.right - moved, viewport.y,
+                       moved, viewport.height)
+    return pg.Rect(viewport.x, viewport.y, -moved, viewport.height)
+
+
+class StaticLayer(object):
+    """The background of a TileMap with the sprites of groups (bricks,
+    coin boxes...) already drawn on it, composed for the viewport last
+    shown.  groups are IndexedGroups.  update() draws only what scrolled
+    into view and the sprites that changed since the last call, so a frame
+    with everything at rest costs one blit."""
+    def __init__(self, tile_map, groups):
+        self.tile_map = tile_map
+        self.groups = groups
+        self.surface = None
+        self.shown = None
+        self.drawn = {}
+
+    def update(self, viewport):
+        """Brings the layer up to date with viewport.  Returns the
+        re-rendered rects, in level coordinates."""
+        if self.surface is None or self.surface.get_size() != viewport.size:
+            self.surface = pg.Surface(viewport.size).convert()
+            self.shown = None
+        exposed = scroll(self.surface, self.shown, viewport)
+        rects = [exposed] if exposed else []
+
+        current = {}
+        for group in self.groups:
+            group.reindex()
+            for sprite in group.query(viewport):
+                current[sprite] = (sprite.image, sprite.rect.topleft)
+        for drawn, other in ((self.drawn, current), (current, self.drawn)):
+            for sprite, (image, position) in drawn.items():
+                if other.get(sprite) != (image, position):
+                    rects.append(pg.Rect(position, image.get_size()))
+
+        rects = merge_rects(rect.clip(viewport) for rect in rects)
+        for rect in rects:
+            self.tile_map.draw_area(self.surface, rect, viewport)
+        redraw(self.surface, list(current.values()),
+               [rect.move(-viewport.x, -viewport.y) for rect in rects],
+               viewport.topleft)
+        self.drawn = current
+        self.shown = pg.Rect(viewport)
+        return rects
+
+    def draw_over(self, surface, sprites, viewport):
+        """Draws the layer's sprites again where they overlap sprites, for
+        sprites that belong underneath them (a mushroom rising out of its
+        box)"""
+        rects = [sprite.rect.move(-viewport.x, -viewport.y)
+                 for sprite in sprites]
+        if rects:
+            redraw(surface, list(self.drawn.values()), rects,
+                   viewport.topleft)
+
+    def draw_background(self, surface, rects):
+        """Restores the layer inside rects (screen coordinates)"""
+        for rect in rects:
+            surface.blit(self.surface, rect, rect)
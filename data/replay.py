@@ -0,0 +1,128 @@
+"""
+Input recording and replay.
+
+Game time advances by a fixed step per tick and Level2 draws its terrain
+from a seeded generator, so a run is fully determined by its seed and the
+key state of every tick.  Recorder keeps that key state as a bit mask of
+RECORDED_KEYS, run-length encoded.  A replay file is the list of runs plus
+the seed and the level; Player feeds it back to Control.step as fast as
+the headless loop goes.
+
+    python mario_headless.py --level 1 --ticks 6000 --record run.json
+    python mario_headless.py --replay run.json
+
+A normal game is recorded from the main menu with MARIO_RECORD=run.json.
+Replays that load a save (F9) depend on the save files being the same.
+"""
+
+import json
+import random
+import pygame as pg
+from . import tools
+from . import constants as c
+
+REPLAY_VERSION = 1
+# Every key a state looks up in the key state.  Bit n of a mask is
+# RECORDED_KEYS[n]; files list the key names so the order can change.
+RECORDED_KEYS = (pg.K_a, pg.K_d, pg.K_s, pg.K_w, pg.K_SPACE, pg.K_f, pg.K_g,
+                 pg.K_i, pg.K_F5, pg.K_F9, pg.K_RETURN, pg.K_ESCAPE,
+                 pg.K_UP, pg.K_DOWN)
+
+
+def new_seed():
+    return random.randrange(2 ** 31)
+
+
+def key_mask(keys, codes=RECORDED_KEYS):
+    """The bit mask of codes held down in keys"""
+    mask = 0
+    for bit, code in enumerate(codes):
+        if keys[code]:
+            mask |= 1 << bit
+    return mask
+
+
+class Recorder(object):
+    """Collects the key state of every tick Control.step runs.  level is
+    the level a headless run starts in, None for a game started from the
+    main menu."""
+    def __init__(self, seed, level=None, tick_rate=60):
+        self.seed = seed
+        self.level = level
+        self.tick_rate = tick_rate
+        self.runs = []
+
+    def record(self, keys):
+        mask = key_mask(keys)
+        if self.runs and self.runs[-1][0] == mask:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([mask, 1])
+
+    def save(self, path):
+        data = {'version': REPLAY_VERSION,
+                'level': self.level,
+                'seed': self.seed,
+                'tick_rate': self.tick_rate,
+                'keys': [pg.key.name(code) for code in RECORDED_KEYS],
+                'ticks': sum(count for mask, count in self.runs),
+                'input': [value for run in self.runs for value in run]}
+        with open(path, 'w') as replay_file:
+            json.dump(data, replay_file, separators=(',', ':'))
+
+
+class Replay(object):
+    """A loaded replay file"""
+    def __init__(self, data):
+        if data['version'] != REPLAY_VERSION:
+            raise ValueError('unsupported replay version {}'.format(
+                data['version']))
+        self.level = data['level']
+        self.seed = data['seed']
+        self.tick_rate = data['tick_rate']
+        self.ticks = data['ticks']
+        self.codes = [pg.key.key_code(name) for name in data['keys']]
+        values = data['input']
+        self.runs = list(zip(values[0::2], values[1::2]))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as replay_file:
+            return cls(json.load(replay_file))
+
+    def key_states(self):
+        """The KeyState of every tick, in order"""
+        for mask, count in self.runs:
+            keys = tools.KeyState(code for bit, code in enumerate(self.codes)
+                                  if mask & 1 << bit)
+            for tick in range(count):
+                yield keys
+
+
+class Player(object):
+    """A policy for Control.run_headless that plays a replay back.  Keys
+    that went down since the last tick are also passed to
+    Control.key_down, as the event loop does."""
+    def __init__(self, replay):
+        self.key_states = replay.key_states()
+        self.previous = tools.KeyState()
+
+    def __call__(self, control):
+        keys = next(self.key_states)
+        for key in keys.pressed - self.previous.pressed:
+            control.key_down(key)
+        self.previous = keys
+        return keys
+
+
+def summary(control):
+    """Where a run ended up, to compare two runs of the same replay"""
+    state = control.state
+    game_info = getattr(state, 'game_info', {})
+    mario = getattr(state, 'mario', None)
+    return {'ticks': control.game_clock.ticks,
+            'state': control.state_name,
+            'score': game_info.get(c.SCORE),
+            'coins': game_info.get(c.COIN_TOTAL),
+            'lives': game_info.get(c.LIVES),
+            'mario': tuple(mario.rect.topleft) if mario else None}
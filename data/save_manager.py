@@ -1,20 +1,86 @@
 import os
+import json
 import pickle
-import pygame as pg
 from . import constants as c
 
 class SaveManager:
-    def __init__(self, save_dir="saves"):
+    def __init__(self, clock, save_dir="saves"):
+        # 游戏时钟（tools.GameClock），时间戳用游戏时间而不是系统时间
+        self.clock = clock
         self.save_dir = save_dir
         self.current_slot = 1
         self.max_slots = 3
         self.create_save_directory()
+        # 每个槽位的摘要（分数、生命、金币、时间戳、文件修改时间），
+        # 存在内存和 index.json 里，绘制存档菜单时不用读盘
+        self.slot_index = self.load_index()
     
     def create_save_directory(self):
         """创建存档目录"""
         if not os.path.exists(self.save_dir):
             os.makedirs(self.save_dir)
     
+    def get_index_path(self):
+        """获取存档索引文件路径"""
+        return os.path.join(self.save_dir, "index.json")
+    
+    def load_index(self):
+        """读取存档索引，和存档文件对不上的槽位重新生成"""
+        try:
+            with open(self.get_index_path(), 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        
+        index = {}
+        changed = False
+        for slot in range(1, self.max_slots + 1):
+            save_path = self.get_save_path(slot)
+            entry = stored.get(str(slot))
+            if not os.path.exists(save_path):
+                changed = changed or entry is not None
+                continue
+            if entry is None or entry.get('mtime') != os.path.getmtime(save_path):
+                entry = self.read_slot_summary(slot)
+                changed = True
+            if entry is not None:
+                index[slot] = entry
+        
+        if changed:
+            self.write_index(index)
+        return index
+    
+    def write_index(self, index=None):
+        """把索引写回磁盘"""
+        if index is None:
+            index = self.slot_index
+        try:
+            with open(self.get_index_path(), 'w', encoding='utf-8') as f:
+                json.dump(dict((str(slot), entry) for slot, entry in index.items()), f)
+        except OSError as e:
+            print(f"写入存档索引失败: {e}")
+    
+    def make_summary(self, save_data, slot):
+        """从存档数据生成槽位摘要"""
+        game_info = save_data['game_info']
+        return {
+            'score': game_info.get(c.SCORE, 0),
+            'lives': game_info.get(c.LIVES, 3),
+            'coins': game_info.get(c.COIN_TOTAL, 0),
+            'timestamp': save_data.get('timestamp', 0),
+            'mtime': os.path.getmtime(self.get_save_path(slot))
+        }
+    
+    def read_slot_summary(self, slot):
+        """读取存档文件生成摘要（只在索引缺失或过期时调用）"""
+        try:
+            with open(self.get_save_path(slot), 'rb') as f:
+                save_data = pickle.load(f)
+            return self.make_summary(save_data, slot)
+        except Exception as e:
+            print(f"读取槽位 {slot} 失败: {e}")
+            return None
+    
     def get_save_path(self, slot=None):
         """获取存档文件路径"""
         if slot is None:
@@ -31,15 +97,19 @@ class SaveManager:
                 'game_info': game_info.copy(),
                 'level_state': level_state,
                 'mario_state': mario_state,
-                'timestamp': pg.time.get_ticks()
+                'timestamp': self.clock.get_ticks()
             }
             
             # 确保游戏信息中的关键数据被保存
-            save_data['game_info'][c.CURRENT_TIME] = pg.time.get_ticks()
+            save_data['game_info'][c.CURRENT_TIME] = self.clock.get_ticks()
             
             with open(self.get_save_path(slot), 'wb') as f:
                 pickle.dump(save_data, f)
             
+            if isinstance(slot, int) and 1 <= slot <= self.max_slots:
+                self.slot_index[slot] = self.make_summary(save_data, slot)
+                self.write_index()
+            
             print(f"游戏已保存到槽位 {slot}")
             return True
         except Exception as e:
@@ -71,16 +141,12 @@ class SaveManager:
         return os.path.exists(self.get_save_path(slot))
     
     def get_slot_info(self, slot):
-        """获取存档槽位信息"""
-        save_data = self.load_game(slot)
-        if save_data:
-            return {
-                'exists': True,
-                'score': save_data['game_info'].get(c.SCORE, 0),
-                'lives': save_data['game_info'].get(c.LIVES, 3),
-                'coins': save_data['game_info'].get(c.COIN_TOTAL, 0),
-                'timestamp': save_data.get('timestamp', 0)
-            }
+        """获取存档槽位信息（来自内存中的索引，不读盘）"""
+        entry = self.slot_index.get(slot)
+        if entry:
+            info = dict(entry)
+            info['exists'] = True
+            return info
         return {'exists': False}
     
     def delete_save(self, slot):
@@ -89,8 +155,10 @@ class SaveManager:
             save_path = self.get_save_path(slot)
             if os.path.exists(save_path):
                 os.remove(save_path)
+                if self.slot_index.pop(slot, None) is not None:
+                    self.write_index()
                 print(f"槽位 {slot} 的存档已删除")
                 return True
         except Exception as e:
             print(f"删除存档失败: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -5,12 +5,21 @@ This module initializes the display and creates dictionaries of resources.
 """
 
 import os
+from concurrent import futures
 import pygame as pg
-from . import tools
+from . import tools, bake
 from .import constants as c
 
 ORIGINAL_CAPTION = c.ORIGINAL_CAPTION
 
+# Set MARIO_HEADLESS=1 before importing the game to run without a window
+# or sound card (batch testing, bots).  SDL still needs a display mode for
+# convert(), so the dummy drivers provide an off-screen one.
+HEADLESS = os.environ.get('MARIO_HEADLESS') == '1'
+
+if HEADLESS:
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
 
 os.environ['SDL_VIDEO_CENTERED'] = '1'
 pg.init()
@@ -18,11 +27,21 @@ pg.event.set_allowed([pg.KEYDOWN, pg.KEYUP, pg.QUIT])
 pg.display.set_caption(c.ORIGINAL_CAPTION)
 SCREEN = pg.display.set_mode(c.SCREEN_SIZE)
 SCREEN_RECT = SCREEN.get_rect()
+tools.startup_timer.mark('display')
 
 
 FONTS = tools.load_all_fonts(os.path.join("resources","fonts"))
 MUSIC = tools.load_all_music(os.path.join("resources","music"))
-GFX   = tools.load_all_gfx(os.path.join("resources","graphics"))
-SFX   = tools.load_all_sfx(os.path.join("resources","sound"))
+
+# Sounds and images are decoded on worker threads.  The sound jobs go in
+# first so they run while the main thread converts the images.
+with futures.ThreadPoolExecutor() as pool:
+    sounds = tools.decode_all(os.path.join("resources","sound"),
+                              pg.mixer.Sound, tools.SFX_TYPES, pool,
+                              tools.SFX_EXCLUDE)
+    GFX = bake.load_graphics(os.path.join("resources","graphics"), pool=pool)
+    tools.startup_timer.mark('graphics')
+    SFX = dict(sounds)
+    tools.startup_timer.mark('sound')
 
 
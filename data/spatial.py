@@ -0,0 +1,149 @@
+"""
+Spatial index for the sprites of a level.
+
+The levels are several thousand pixels wide but only a screen's worth is
+seen or touched at a time.  SpatialHash buckets sprites by the grid cells
+their rects cover, so finding the sprites near a rect looks at a few
+cells instead of every sprite.  IndexedGroup is a sprite group that keeps
+such an index of its own sprites.
+
+Moving sprites are re-bucketed by IndexedGroup.reindex(), once a tick.
+Collision queries look SLACK pixels further than asked, so sprites that
+moved since then are still found; the exact test uses their current rect.
+"""
+
+import pygame as pg
+
+CELL_SIZE = 128
+# How far a sprite may move between two reindex() calls and still be found
+# by collideany().  Nothing in the game moves this fast in one tick.
+SLACK = 32
+
+
+class SpatialHash(object):
+    """Sprites bucketed by the CELL_SIZE squares their rects cover"""
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.spans = {}
+        self.rects = {}
+
+    def span(self, rect):
+        """First and last cell column and row covered by rect"""
+        size = self.cell_size
+        left, top, width, height = rect
+        return (left // size, top // size,
+                (left + width - 1) // size if width else left // size,
+                (top + height - 1) // size if height else top // size)
+
+    def cells_in(self, span):
+        left, top, right, bottom = span
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                yield x, y
+
+    def insert(self, sprite):
+        span = self.span(sprite.rect)
+        self.spans[sprite] = span
+        self.rects[sprite] = pg.Rect(sprite.rect)
+        for cell in self.cells_in(span):
+            self.cells.setdefault(cell, set()).add(sprite)
+
+    def remove(self, sprite):
+        span = self.spans.pop(sprite, None)
+        if span is None:
+            return
+        del self.rects[sprite]
+        for cell in self.cells_in(span):
+            bucket = self.cells[cell]
+            bucket.discard(sprite)
+            if not bucket:
+                del self.cells[cell]
+
+    def move(self, sprite):
+        """Re-buckets sprite if its rect has left its old cells"""
+        rect = sprite.rect
+        if rect == self.rects[sprite]:
+            return
+        span = self.span(rect)
+        if span == self.spans[sprite]:
+            self.rects[sprite].update(rect)
+        else:
+            self.remove(sprite)
+            self.insert(sprite)
+
+    def query(self, rect):
+        """Sprites in the cells rect covers.  They are near rect, but do
+        not necessarily collide with it."""
+        left, top, right, bottom = span = self.span(rect)
+        if (right - left + 1) * (bottom - top + 1) > len(self.spans):
+            # Fewer sprites than cells to look in
+            return set(self.spans)
+        found = set()
+        for cell in self.cells_in(span):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        return found
+
+
+class IndexedGroup(pg.sprite.Group):
+    """A sprite group with a SpatialHash of its sprites.  Sprites that
+    moved are re-bucketed by reindex(), which the level calls once a tick
+    before querying.
+
+    Sprites are ordered by when they were added, or by key(sprite) if a
+    key is given, for sprites that come and go but keep their priority."""
+    def __init__(self, *sprites, key=None):
+        self.index = SpatialHash()
+        self.order = {}
+        self.added = 0
+        self.key = key
+        pg.sprite.Group.__init__(self, *sprites)
+
+    def add_internal(self, sprite, layer=None):
+        pg.sprite.Group.add_internal(self, sprite, layer)
+        if self.key is None:
+            self.order[sprite] = self.added
+            self.added += 1
+        else:
+            self.order[sprite] = self.key(sprite)
+        self.index.insert(sprite)
+
+    def remove_internal(self, sprite):
+        pg.sprite.Group.remove_internal(self, sprite)
+        del self.order[sprite]
+        self.index.remove(sprite)
+
+    def reindex(self):
+        for sprite in self.spritedict:
+            self.index.move(sprite)
+
+    def query(self, rect):
+        """Sprites colliding with rect, in the order they were added (the
+        order Group.draw uses, unless the group has a key)"""
+        found = [sprite for sprite in self.index.query(rect)
+                 if sprite.rect.colliderect(rect)]
+        found.sort(key=self.order.__getitem__)
+        return found
+
+    def collideany(self, sprite):
+        """pg.sprite.spritecollideany(sprite, self), looking only at the
+        sprites indexed near sprite"""
+        rect = sprite.rect
+        first = None
+        for other in self.index.query(rect.inflate(SLACK * 2, SLACK * 2)):
+            if other.rect.colliderect(rect):
+                if first is None or self.order[other] < self.order[first]:
+                    first = other
+        return first
+
+
+def collideany(sprite, *groups):
+    """The first sprite of groups (IndexedGroups, in order) that collides
+    with sprite, or None"""
+    for group in groups:
+        other = group.collideany(sprite)
+        if other is not None:
+            return other
+    return None
@@ -4,14 +4,13 @@ import os
 import pickle
 
 import pygame as pg
-from .. import setup, tools
+from .. import setup, tools, text, render, spatial, levels, chunks
+from .. import tilemap
 from .. import constants as c
 from .. import game_sound
 from .. components import mario
-from .. components import collider
 from .. components import bricks
 from .. components import coin_box
-from .. components import enemies
 from .. components import checkpoint
 from .. components import flagpole
 from .. components import info
@@ -20,14 +19,18 @@ from .. components import castle_flag
 
 
 class Level1(tools._State):
-    def __init__(self):
+    def __init__(self, level_name='level_1'):
         tools._State.__init__(self)
+        # resources/levels里的关卡文件名
+        self.level_name = level_name
+        self.ground_step_pipe_group = None
         # 添加作弊相关属性
         self.cheat_mode = False
         self.cheat_activated = False
         self.last_f_key_press_time = 0
         self.f_key_cooldown = 500  # 500ms冷却时间防止重复触发
         # 存档相关属性
+        self.autosave_enabled = True  # 无界面运行和训练环境里关闭，不写存档文件
         self.last_auto_save_time = 0
         self.f5_pressed = False  # 存档按键状态
         self.f9_pressed = False  # 读档按键状态
@@ -50,6 +53,7 @@ class Level1(tools._State):
         self.game_info[c.LEVEL_STATE] = c.NOT_FROZEN
         self.game_info[c.MARIO_DEAD] = False
         self.cheat_mode = False
+        self.last_auto_save_time = 0
 
         self.state = c.NOT_FROZEN
         self.death_timer = 0
@@ -61,10 +65,8 @@ class Level1(tools._State):
         self.overhead_info_display = info.OverheadInfo(self.game_info, c.LEVEL)
         self.sound_manager = game_sound.Sound(self.overhead_info_display)
 
+        self.level_data = levels.load(self.level_name)
         self.setup_background()
-        self.setup_ground()
-        self.setup_pipes()
-        self.setup_steps()
         self.setup_bricks()
         self.setup_coin_boxes()
         self.setup_flag_pole()
@@ -72,6 +74,15 @@ class Level1(tools._State):
         self.setup_mario()
         self.setup_checkpoints()
         self.setup_spritegroups()
+        self.setup_chunks()
+
+        # 脏矩形渲染：记录上一帧画了什么，镜头不动时只重画变化的区域
+        self.level_tracker = render.DirtyTracker()
+        self.screen_tracker = render.DirtyTracker()
+        self.drawn_viewport_x = None
+        # 静止的砖块和问号箱预先画在背景图块上，只有状态变化的格子才重画
+        self.static_layer = render.StaticLayer(
+            self.tile_map, (self.brick_group, self.coin_box_group))
 
     def get_save_data(self):
         """获取当前游戏状态数据用于存档"""
@@ -149,8 +160,10 @@ class Level1(tools._State):
 
     def auto_save(self):
         """自动存档（在检查点触发时调用）"""
-        current_time = pg.time.get_ticks()
-        # 防止过于频繁的自动存档（至少间隔30秒）
+        if not self.autosave_enabled:
+            return
+        current_time = self.current_time
+        # 防止过于频繁的自动存档（至少间隔30秒游戏时间）
         if hasattr(self, 'last_auto_save_time') and current_time - self.last_auto_save_time < 30000:
             return
         
@@ -168,19 +181,6 @@ class Level1(tools._State):
             except Exception as e:
                 print(f"自动存档失败: {e}")
 
-    # 在检查点方法中添加自动存档
-    def check_points_check(self):
-        """Detect if checkpoint collision occurs, delete checkpoint,
-        add enemies to self.enemy_group"""
-        checkpoint = pg.sprite.spritecollideany(self.mario,
-                                                 self.check_point_group)
-        if checkpoint:
-            checkpoint.kill()
-
-            # 重要检查点触发自动存档
-            if checkpoint.name in ['5', '10', '11']:  # 在关键检查点自动存档
-                self.auto_save()
-
     def toggle_cheat_mode(self, current_time):
         """切换作弊模式"""
         if current_time - self.last_f_key_press_time < self.f_key_cooldown:
@@ -236,7 +236,8 @@ class Level1(tools._State):
             
         self.handle_states(keys)
         self.check_if_time_out()
-        self.blit_everything(surface)
+        if self.rendering:
+            self.blit_everything(surface)
         self.sound_manager.update(self.game_info, self.mario)
         
         # 确保作弊状态持续生效
@@ -338,257 +339,69 @@ class Level1(tools._State):
 
 
     def setup_background(self):
-        """Sets the background image, rect and scales it to the correct
-        proportions"""
-        self.background = setup.GFX['level_1']
-        self.back_rect = self.background.get_rect()
-        self.background = pg.transform.scale(self.background,
-                                  (int(self.back_rect.width*c.BACKGROUND_MULTIPLER),
-                                  int(self.back_rect.height*c.BACKGROUND_MULTIPLER)))
-        self.back_rect = self.background.get_rect()
-        width = self.back_rect.width
-        height = self.back_rect.height
-
-        self.level = pg.Surface((width, height)).convert()
-        self.level_rect = self.level.get_rect()
+        """Sets the background image and the size of the level once it is
+        scaled to the correct proportions"""
+        self.background = setup.GFX[self.level_data.background]
+        scale = self.level_data.background_scale
+        self.level_rect = pg.Rect(0, 0,
+                                  int(self.background.get_width() * scale),
+                                  int(self.background.get_height() * scale))
+        # 背景拆成去重的小图块，只合成镜头内的部分
+        self.tile_map = tilemap.get(self.background, self.level_rect.size)
         self.viewport = setup.SCREEN.get_rect(bottom=self.level_rect.bottom)
-        self.viewport.x = self.game_info[c.CAMERA_START_X]
-
-
-    def setup_ground(self):
-        """Creates collideable, invisible rectangles over top of the ground for
-        sprites to walk on"""
-        ground_rect1 = collider.Collider(0, c.GROUND_HEIGHT,    2953, 60)
-        ground_rect2 = collider.Collider(3048, c.GROUND_HEIGHT,  635, 60)
-        ground_rect3 = collider.Collider(3819, c.GROUND_HEIGHT, 2735, 60)
-        ground_rect4 = collider.Collider(6647, c.GROUND_HEIGHT, 2300, 60)
-
-        self.ground_group = pg.sprite.Group(ground_rect1,
-                                           ground_rect2,
-                                           ground_rect3,
-                                           ground_rect4)
-
-
-    def setup_pipes(self):
-        """Create collideable rects for all the pipes"""
-
-        pipe1 = collider.Collider(1202, 452, 83, 82)
-        pipe2 = collider.Collider(1631, 409, 83, 140)
-        pipe3 = collider.Collider(1973, 366, 83, 170)
-        pipe4 = collider.Collider(2445, 366, 83, 170)
-        pipe5 = collider.Collider(6989, 452, 83, 82)
-        pipe6 = collider.Collider(7675, 452, 83, 82)
-
-        self.pipe_group = pg.sprite.Group(pipe1, pipe2,
-                                          pipe3, pipe4,
-                                          pipe5, pipe6)
-
-
-    def setup_steps(self):
-        """Create collideable rects for all the steps"""
-        step1 = collider.Collider(5745, 495, 40, 44)
-        step2 = collider.Collider(5788, 452, 40, 44)
-        step3 = collider.Collider(5831, 409, 40, 44)
-        step4 = collider.Collider(5874, 366, 40, 176)
-
-
-        step5 = collider.Collider(6001, 366, 40, 176)
-        step6 = collider.Collider(6044, 408, 40, 40)
-        step7 = collider.Collider(6087, 452, 40, 40)
-        step8 = collider.Collider(6130, 495, 40, 40)
-
-        step9 = collider.Collider(6345, 495, 40, 40)
-        step10 = collider.Collider(6388, 452, 40, 40)
-        step11 = collider.Collider(6431, 409, 40, 40)
-        step12 = collider.Collider(6474, 366, 40, 40)
-        step13 = collider.Collider(6517, 366, 40, 176)
-
-        step14 = collider.Collider(6644, 366, 40, 176)
-        step15 = collider.Collider(6687, 408, 40, 40)
-        step16 = collider.Collider(6728, 452, 40, 40)
-        step17 = collider.Collider(6771, 495, 40, 40)
-
-        step18 = collider.Collider(7760, 495, 40, 40)
-        step19 = collider.Collider(7803, 452, 40, 40)
-        step20 = collider.Collider(7845, 409, 40, 40)
-        step21 = collider.Collider(7888, 366, 40, 40)
-        step22 = collider.Collider(7931, 323, 40, 40)
-        step23 = collider.Collider(7974, 280, 40, 40)
-        step24 = collider.Collider(8017, 237, 40, 40)
-        step25 = collider.Collider(8060, 194, 40, 40)
-        step26 = collider.Collider(8103, 194, 40, 360)
-
-        step27 = collider.Collider(8488, 495, 40, 40)
-
-        self.step_group = pg.sprite.Group(step1,  step2,
-                                          step3,  step4,
-                                          step5,  step6,
-                                          step7,  step8,
-                                          step9,  step10,
-                                          step11, step12,
-                                          step13, step14,
-                                          step15, step16,
-                                          step17, step18,
-                                          step19, step20,
-                                          step21, step22,
-                                          step23, step24,
-                                          step25, step26,
-                                          step27)
+        self.viewport.x = (self.game_info[c.CAMERA_START_X] or
+                           self.level_data.camera_start_x)
+
+
+    def content_group(self, contents):
+        """The group a brick or coin box puts its contents in"""
+        if contents is None:
+            return None
+        if contents in (c.COIN, c.SIXCOINS):
+            return self.coin_group
+        return self.powerup_group
 
 
     def setup_bricks(self):
         """Creates all the breakable bricks for the level.  Coin and
         powerup groups are created so they can be passed to bricks."""
-        self.coin_group = pg.sprite.Group()
-        self.powerup_group = pg.sprite.Group()
-        self.brick_pieces_group = pg.sprite.Group()
-
-        brick1  = bricks.Brick(858,  365)
-        brick2  = bricks.Brick(944,  365)
-        brick3  = bricks.Brick(1030, 365)
-        brick4  = bricks.Brick(3299, 365)
-        brick5  = bricks.Brick(3385, 365)
-        brick6  = bricks.Brick(3430, 193)
-        brick7  = bricks.Brick(3473, 193)
-        brick8  = bricks.Brick(3516, 193)
-        brick9  = bricks.Brick(3559, 193)
-        brick10 = bricks.Brick(3602, 193)
-        brick11 = bricks.Brick(3645, 193)
-        brick12 = bricks.Brick(3688, 193)
-        brick13 = bricks.Brick(3731, 193)
-        brick14 = bricks.Brick(3901, 193)
-        brick15 = bricks.Brick(3944, 193)
-        brick16 = bricks.Brick(3987, 193)
-        brick17 = bricks.Brick(4030, 365, c.SIXCOINS, self.coin_group)
-        brick18 = bricks.Brick(4287, 365)
-        brick19 = bricks.Brick(4330, 365, c.STAR, self.powerup_group)
-        brick20 = bricks.Brick(5058, 365)
-        brick21 = bricks.Brick(5187, 193)
-        brick22 = bricks.Brick(5230, 193)
-        brick23 = bricks.Brick(5273, 193)
-        brick24 = bricks.Brick(5488, 193)
-        brick25 = bricks.Brick(5574, 193)
-        brick26 = bricks.Brick(5617, 193)
-        brick27 = bricks.Brick(5531, 365)
-        brick28 = bricks.Brick(5574, 365)
-        brick29 = bricks.Brick(7202, 365)
-        brick30 = bricks.Brick(7245, 365)
-        brick31 = bricks.Brick(7331, 365)
-
-        self.brick_group = pg.sprite.Group(brick1,  brick2,
-                                           brick3,  brick4,
-                                           brick5,  brick6,
-                                           brick7,  brick8,
-                                           brick9,  brick10,
-                                           brick11, brick12,
-                                           brick13, brick14,
-                                           brick15, brick16,
-                                           brick17, brick18,
-                                           brick19, brick20,
-                                           brick21, brick22,
-                                           brick23, brick24,
-                                           brick25, brick26,
-                                           brick27, brick28,
-                                           brick29, brick30,
-                                           brick31)
+        self.coin_group = spatial.IndexedGroup()
+        self.powerup_group = spatial.IndexedGroup()
+        self.brick_pieces_group = spatial.IndexedGroup()
+
+        # Filled chunk by chunk, see setup_chunks
+        self.brick_group = spatial.IndexedGroup()
+
+
+    def create_brick(self, spec):
+        x, y, contents = spec
+        return bricks.Brick(x, y, contents, self.content_group(contents))
 
 
     def setup_coin_boxes(self):
-        """Creates all the coin boxes and puts them in a sprite group"""
-        coin_box1  = coin_box.Coin_box(685, 365, c.COIN, self.coin_group)
-        coin_box2  = coin_box.Coin_box(901, 365, c.MUSHROOM, self.powerup_group)
-        coin_box3  = coin_box.Coin_box(987, 365, c.COIN, self.coin_group)
-        coin_box4  = coin_box.Coin_box(943, 193, c.COIN, self.coin_group)
-        coin_box5  = coin_box.Coin_box(3342, 365, c.MUSHROOM, self.powerup_group)
-        coin_box6  = coin_box.Coin_box(4030, 193, c.COIN, self.coin_group)
-        coin_box7  = coin_box.Coin_box(4544, 365, c.COIN, self.coin_group)
-        coin_box8  = coin_box.Coin_box(4672, 365, c.COIN, self.coin_group)
-        coin_box9  = coin_box.Coin_box(4672, 193, c.MUSHROOM, self.powerup_group)
-        coin_box10 = coin_box.Coin_box(4800, 365, c.COIN, self.coin_group)
-        coin_box11 = coin_box.Coin_box(5531, 193, c.COIN, self.coin_group)
-        coin_box12 = coin_box.Coin_box(7288, 365, c.COIN, self.coin_group)
-
-        self.coin_box_group = pg.sprite.Group(coin_box1,  coin_box2,
-                                              coin_box3,  coin_box4,
-                                              coin_box5,  coin_box6,
-                                              coin_box7,  coin_box8,
-                                              coin_box9,  coin_box10,
-                                              coin_box11, coin_box12)
+        """Creates the coin box group, filled chunk by chunk"""
+        self.coin_box_group = spatial.IndexedGroup()
+
+
+    def create_coin_box(self, spec):
+        x, y, contents = spec
+        return coin_box.Coin_box(x, y, contents, self.content_group(contents))
 
 
     def setup_flag_pole(self):
         """Creates the flag pole at the end of the level"""
-        self.flag = flagpole.Flag(8505, 100)
-
-        pole0 = flagpole.Pole(8505, 97)
-        pole1 = flagpole.Pole(8505, 137)
-        pole2 = flagpole.Pole(8505, 177)
-        pole3 = flagpole.Pole(8505, 217)
-        pole4 = flagpole.Pole(8505, 257)
-        pole5 = flagpole.Pole(8505, 297)
-        pole6 = flagpole.Pole(8505, 337)
-        pole7 = flagpole.Pole(8505, 377)
-        pole8 = flagpole.Pole(8505, 417)
-        pole9 = flagpole.Pole(8505, 450)
-
-        finial = flagpole.Finial(8507, 97)
-
-        self.flag_pole_group = pg.sprite.Group(self.flag,
-                                               finial,
-                                               pole0,
-                                               pole1,
-                                               pole2,
-                                               pole3,
-                                               pole4,
-                                               pole5,
-                                               pole6,
-                                               pole7,
-                                               pole8,
-                                               pole9)
+        self.flag = flagpole.Flag(*self.level_data.flag)
+        finial = flagpole.Finial(*self.level_data.finial)
+        poles = [flagpole.Pole(x, y) for x, y in self.level_data.poles]
+
+        self.flag_pole_group = spatial.IndexedGroup(self.flag, finial, poles)
 
 
     def setup_enemies(self):
         """Creates all the enemies and stores them in a list of lists."""
-        goomba0 = enemies.Goomba()
-        goomba1 = enemies.Goomba()
-        goomba2 = enemies.Goomba()
-        goomba3 = enemies.Goomba()
-        goomba4 = enemies.Goomba(193)
-        goomba5 = enemies.Goomba(193)
-        goomba6 = enemies.Goomba()
-        goomba7 = enemies.Goomba()
-        goomba8 = enemies.Goomba()
-        goomba9 = enemies.Goomba()
-        goomba10 = enemies.Goomba()
-        goomba11 = enemies.Goomba()
-        goomba12 = enemies.Goomba()
-        goomba13 = enemies.Goomba()
-        goomba14 = enemies.Goomba()
-        goomba15 = enemies.Goomba()
-
-        koopa0 = enemies.Koopa()
-
-        enemy_group1 = pg.sprite.Group(goomba0)
-        enemy_group2 = pg.sprite.Group(goomba1)
-        enemy_group3 = pg.sprite.Group(goomba2, goomba3)
-        enemy_group4 = pg.sprite.Group(goomba4, goomba5)
-        enemy_group5 = pg.sprite.Group(goomba6, goomba7)
-        enemy_group6 = pg.sprite.Group(koopa0)
-        enemy_group7 = pg.sprite.Group(goomba8, goomba9)
-        enemy_group8 = pg.sprite.Group(goomba10, goomba11)
-        enemy_group9 = pg.sprite.Group(goomba12, goomba13)
-        enemy_group10 = pg.sprite.Group(goomba14, goomba15)
-
-        self.enemy_group_list = [enemy_group1,
-                                 enemy_group2,
-                                 enemy_group3,
-                                 enemy_group4,
-                                 enemy_group5,
-                                 enemy_group6,
-                                 enemy_group7,
-                                 enemy_group8,
-                                 enemy_group9,
-                                 enemy_group10]
+        self.enemy_group_list = [
+            pg.sprite.Group([kind(**options) for kind, options in group])
+            for group in self.level_data.enemy_groups]
 
 
     def setup_mario(self):
@@ -599,47 +412,55 @@ class Level1(tools._State):
 
 
     def setup_checkpoints(self):
-        """Creates invisible checkpoints that when collided will trigger
-        the creation of enemies from the self.enemy_group_list"""
-        check1 = checkpoint.Checkpoint(510, "1")
-        check2 = checkpoint.Checkpoint(1400, '2')
-        check3 = checkpoint.Checkpoint(1740, '3')
-        check4 = checkpoint.Checkpoint(3080, '4')
-        check5 = checkpoint.Checkpoint(3750, '5')
-        check6 = checkpoint.Checkpoint(4150, '6')
-        check7 = checkpoint.Checkpoint(4470, '7')
-        check8 = checkpoint.Checkpoint(4950, '8')
-        check9 = checkpoint.Checkpoint(5100, '9')
-        check10 = checkpoint.Checkpoint(6800, '10')
-        check11 = checkpoint.Checkpoint(8504, '11', 5, 6)
-        check12 = checkpoint.Checkpoint(8775, '12')
-        check13 = checkpoint.Checkpoint(2740, 'secret_mushroom', 360, 40, 12)
-
-        self.check_point_group = pg.sprite.Group(check1, check2, check3,
-                                                 check4, check5, check6,
-                                                 check7, check8, check9,
-                                                 check10, check11, check12,
-                                                 check13)
+        """Invisible checkpoints that spawn the enemy groups, start the
+        flag pole and castle sequences and hide the secret 1up box"""
+        self.checkpoint_queue = checkpoint.TriggerQueue(self.level_data.lines)
+        # Not full height lines, so they are tested against Mario's rect
+        self.secret_checkpoints = list(self.level_data.boxes)
+
+        self.checkpoint_actions = {
+            checkpoint.SPAWN_ENEMIES: self.spawn_enemy_group,
+            checkpoint.FLAG_POLE: self.start_flag_sequence,
+            checkpoint.ENTER_CASTLE: self.enter_castle,
+            checkpoint.SECRET_MUSHROOM: self.reveal_secret_mushroom}
 
 
     def setup_spritegroups(self):
         """Sprite groups created for convenience"""
-        self.sprites_about_to_die_group = pg.sprite.Group()
-        self.shell_group = pg.sprite.Group()
-        self.enemy_group = pg.sprite.Group()
-
-        self.ground_step_pipe_group = pg.sprite.Group(self.ground_group,
-                                                      self.pipe_group,
-                                                      self.step_group)
-
-        self.mario_and_enemy_group = pg.sprite.Group(self.mario,
-                                                     self.enemy_group)
-
-
+        self.sprites_about_to_die_group = spatial.IndexedGroup()
+        self.shell_group = spatial.IndexedGroup()
+        self.enemy_group = spatial.IndexedGroup()
+
+        # The colliders are shared by every life (levels.load), so they
+        # have to leave the group of the last one
+        if self.ground_step_pipe_group is not None:
+            self.ground_step_pipe_group.empty()
+        self.ground_step_pipe_group = spatial.IndexedGroup(
+            key=self.level_data.collider_rank.__getitem__)
+
+        self.mario_and_enemy_group = spatial.IndexedGroup(self.mario,
+                                                          self.enemy_group)
+
+
+    def setup_chunks(self):
+        """Streams the colliders and blocks of the level in around the
+        camera"""
+        self.chunk_stream = chunks.ChunkStream(
+            self.level_rect, self.level_data.chunk_colliders,
+            self.ground_step_pipe_group,
+            [(self.brick_group, self.level_data.chunk_bricks,
+              self.create_brick),
+             (self.coin_box_group, self.level_data.chunk_coin_boxes,
+              self.create_coin_box)],
+            [self.enemy_group, self.shell_group, self.powerup_group,
+             self.coin_group, self.brick_pieces_group,
+             self.sprites_about_to_die_group])
+        self.chunk_stream.update(self.viewport)
 
 
     def handle_states(self, keys):
         """If the level is in a FROZEN state, only mario will update"""
+        self.chunk_stream.update(self.viewport)
         if self.state == c.FROZEN:
             self.update_during_transition_state(keys)
         elif self.state == c.NOT_FROZEN:
@@ -687,14 +508,20 @@ class Level1(tools._State):
             self.flag_score.update(None, self.game_info)
             self.check_to_add_flag_score()
         self.flag_pole_group.update()
+        # Ground, pipes and steps never move and are never re-bucketed
+        for group in (self.brick_group, self.coin_box_group, self.enemy_group,
+                      self.shell_group, self.powerup_group, self.coin_group):
+            group.reindex()
+        self.active_window = self.viewport.inflate(c.ACTIVE_MARGIN * 2,
+                                                   c.ACTIVE_MARGIN * 2)
         self.check_points_check()
-        self.enemy_group.update(self.game_info)
+        self.update_active(self.enemy_group, self.game_info)
         self.sprites_about_to_die_group.update(self.game_info, self.viewport)
-        self.shell_group.update(self.game_info)
-        self.brick_group.update()
-        self.coin_box_group.update(self.game_info)
-        self.powerup_group.update(self.game_info, self.viewport)
-        self.coin_group.update(self.game_info, self.viewport)
+        self.update_active(self.shell_group, self.game_info)
+        self.update_active(self.brick_group)
+        self.update_active(self.coin_box_group, self.game_info)
+        self.update_active(self.powerup_group, self.game_info, self.viewport)
+        self.update_active(self.coin_group, self.game_info, self.viewport)
         self.brick_pieces_group.update()
         self.adjust_sprite_positions()
         self.check_if_mario_in_transition_state()
@@ -703,56 +530,82 @@ class Level1(tools._State):
         self.overhead_info_display.update(self.game_info, self.mario)
 
 
-    def check_points_check(self):
-        """Detect if checkpoint collision occurs, delete checkpoint,
-        add enemies to self.enemy_group"""
-        checkpoint = pg.sprite.spritecollideany(self.mario,
-                                                 self.check_point_group)
-        if checkpoint:
-            checkpoint.kill()
-
-            for i in range(1,11):
-                if checkpoint.name == str(i):
-                    for index, enemy in enumerate(self.enemy_group_list[i -1]):
-                        enemy.rect.x = self.viewport.right + (index * 60)
-                    self.enemy_group.add(self.enemy_group_list[i-1])
-
-            if checkpoint.name == '11':
-                self.mario.state = c.FLAGPOLE
-                self.mario.invincible = False
-                self.mario.flag_pole_right = checkpoint.rect.right
-                if self.mario.rect.bottom < self.flag.rect.y:
-                    self.mario.rect.bottom = self.flag.rect.y
-                self.flag.state = c.SLIDE_DOWN
-                self.create_flag_points()
-
-            elif checkpoint.name == '12':
-                self.state = c.IN_CASTLE
-                self.mario.kill()
-                self.mario.state == c.STAND
-                self.mario.in_castle = True
-                self.overhead_info_display.state = c.FAST_COUNT_DOWN
-
-
-            elif checkpoint.name == 'secret_mushroom' and self.mario.y_vel < 0:
-                mushroom_box = coin_box.Coin_box(checkpoint.rect.x,
-                                        checkpoint.rect.bottom - 40,
-                                        '1up_mushroom',
-                                        self.powerup_group)
-                mushroom_box.start_bump(self.moving_score_list)
-                self.coin_box_group.add(mushroom_box)
-
-                self.mario.y_vel = 7
-                self.mario.rect.y = mushroom_box.rect.bottom
-                self.mario.state = c.FALL
+    def active_sprites(self, group):
+        """The sprites of an IndexedGroup inside the activation window
+        around the camera.  The others are frozen until it reaches them."""
+        return group.query(self.active_window)
+
 
+    def update_active(self, group, *args):
+        """group.update(*args) for the active sprites only"""
+        for sprite in self.active_sprites(group):
+            sprite.update(*args)
+
+
+    def check_points_check(self):
+        """Runs the action of every checkpoint Mario reached this frame"""
+        reached = self.checkpoint_queue.reached(self.mario.rect)
+        for point in self.secret_checkpoints:
+            if self.mario.rect.colliderect(point.rect):
+                self.secret_checkpoints.remove(point)
+                reached.append(point)
+                break
+
+        for point in reached:
+            self.checkpoint_actions[point.action](point)
+            if point.autosave:
+                self.auto_save()
             self.mario_and_enemy_group.add(self.enemy_group)
 
 
+    def spawn_enemy_group(self, point):
+        """Brings in the enemies of the checkpoint's group from the right
+        edge of the screen"""
+        group = self.enemy_group_list[point.value]
+        for index, enemy in enumerate(group):
+            enemy.rect.x = self.viewport.right + (index * 60)
+        self.enemy_group.add(group)
+
+
+    def start_flag_sequence(self, point):
+        """Mario grabs the flag pole"""
+        self.mario.state = c.FLAGPOLE
+        self.mario.invincible = False
+        self.mario.flag_pole_right = point.rect.right
+        if self.mario.rect.bottom < self.flag.rect.y:
+            self.mario.rect.bottom = self.flag.rect.y
+        self.flag.state = c.SLIDE_DOWN
+        self.create_flag_points()
+
+
+    def enter_castle(self, point):
+        """Mario disappears into the castle and the time is counted down"""
+        self.state = c.IN_CASTLE
+        self.mario.kill()
+        self.mario.state == c.STAND
+        self.mario.in_castle = True
+        self.overhead_info_display.state = c.FAST_COUNT_DOWN
+
+
+    def reveal_secret_mushroom(self, point):
+        """The hidden 1up box appears if Mario jumps into it from below"""
+        if self.mario.y_vel < 0:
+            mushroom_box = coin_box.Coin_box(point.rect.x,
+                                    point.rect.bottom - 40,
+                                    '1up_mushroom',
+                                    self.powerup_group)
+            mushroom_box.start_bump(self.moving_score_list)
+            self.coin_box_group.add(mushroom_box)
+
+            self.mario.y_vel = 7
+            self.mario.rect.y = mushroom_box.rect.bottom
+            self.mario.state = c.FALL
+
+
     def create_flag_points(self):
         """Creates the points that appear when Mario touches the
         flag pole"""
-        x = 8518
+        x = self.level_data.flag_score_x
         y = c.GROUND_HEIGHT - 60
         mario_bottom = self.mario.rect.bottom
 
@@ -801,12 +654,12 @@ class Level1(tools._State):
 
     def check_mario_x_collisions(self):
         """Check for collisions after Mario is moved on the x axis"""
-        collider = pg.sprite.spritecollideany(self.mario, self.ground_step_pipe_group)
-        coin_box = pg.sprite.spritecollideany(self.mario, self.coin_box_group)
-        brick = pg.sprite.spritecollideany(self.mario, self.brick_group)
-        enemy = pg.sprite.spritecollideany(self.mario, self.enemy_group)
-        shell = pg.sprite.spritecollideany(self.mario, self.shell_group)
-        powerup = pg.sprite.spritecollideany(self.mario, self.powerup_group)
+        collider = self.ground_step_pipe_group.collideany(self.mario)
+        coin_box = self.coin_box_group.collideany(self.mario)
+        brick = self.brick_group.collideany(self.mario)
+        enemy = self.enemy_group.collideany(self.mario)
+        shell = self.shell_group.collideany(self.mario)
+        powerup = self.powerup_group.collideany(self.mario)
 
         if coin_box:
             self.adjust_mario_for_x_collisions(coin_box)
@@ -972,12 +825,12 @@ class Level1(tools._State):
 
     def check_mario_y_collisions(self):
         """Checks for collisions when Mario moves along the y-axis"""
-        ground_step_or_pipe = pg.sprite.spritecollideany(self.mario, self.ground_step_pipe_group)
-        enemy = pg.sprite.spritecollideany(self.mario, self.enemy_group)
-        shell = pg.sprite.spritecollideany(self.mario, self.shell_group)
-        brick = pg.sprite.spritecollideany(self.mario, self.brick_group)
-        coin_box = pg.sprite.spritecollideany(self.mario, self.coin_box_group)
-        powerup = pg.sprite.spritecollideany(self.mario, self.powerup_group)
+        ground_step_or_pipe = self.ground_step_pipe_group.collideany(self.mario)
+        enemy = self.enemy_group.collideany(self.mario)
+        shell = self.shell_group.collideany(self.mario)
+        brick = self.brick_group.collideany(self.mario)
+        coin_box = self.coin_box_group.collideany(self.mario)
+        powerup = self.powerup_group.collideany(self.mario)
 
         brick, coin_box = self.prevent_collision_conflict(brick, coin_box)
 
@@ -1098,7 +951,7 @@ class Level1(tools._State):
         """Kills enemy if on a bumped or broken brick"""
         brick.rect.y -= 5
 
-        enemy = pg.sprite.spritecollideany(brick, self.enemy_group)
+        enemy = self.enemy_group.collideany(brick)
 
         if enemy:
             setup.SFX['kick'].play()
@@ -1137,12 +990,8 @@ class Level1(tools._State):
         """Changes Mario to a FALL state if more than a pixel above a pipe,
         ground, step or box"""
         self.mario.rect.y += 1
-        test_collide_group = pg.sprite.Group(self.ground_step_pipe_group,
-                                                 self.brick_group,
-                                                 self.coin_box_group)
-
-
-        if pg.sprite.spritecollideany(self.mario, test_collide_group) is None:
+        if spatial.collideany(self.mario, self.ground_step_pipe_group,
+                              self.brick_group, self.coin_box_group) is None:
             if self.mario.state != c.JUMP \
                 and self.mario.state != c.DEATH_JUMP \
                 and self.mario.state != c.SMALL_TO_BIG \
@@ -1219,7 +1068,7 @@ class Level1(tools._State):
 
     def adjust_enemy_position(self):
         """Moves all enemies along the x, y axes and check for collisions"""
-        for enemy in self.enemy_group:
+        for enemy in self.active_sprites(self.enemy_group):
             enemy.rect.x += enemy.x_vel
             self.check_enemy_x_collisions(enemy)
 
@@ -1233,8 +1082,8 @@ class Level1(tools._State):
         in order to check against all other enemies then adds it back."""
         enemy.kill()
 
-        collider = pg.sprite.spritecollideany(enemy, self.ground_step_pipe_group)
-        enemy_collider = pg.sprite.spritecollideany(enemy, self.enemy_group)
+        collider = self.ground_step_pipe_group.collideany(enemy)
+        enemy_collider = self.enemy_group.collideany(enemy)
 
         if collider:
             if enemy.direction == c.RIGHT:
@@ -1267,9 +1116,9 @@ class Level1(tools._State):
 
     def check_enemy_y_collisions(self, enemy):
         """Enemy collisions on the y axis"""
-        collider = pg.sprite.spritecollideany(enemy, self.ground_step_pipe_group)
-        brick = pg.sprite.spritecollideany(enemy, self.brick_group)
-        coin_box = pg.sprite.spritecollideany(enemy, self.coin_box_group)
+        collider = self.ground_step_pipe_group.collideany(enemy)
+        brick = self.brick_group.collideany(enemy)
+        coin_box = self.coin_box_group.collideany(enemy)
 
         if collider:
             if enemy.rect.bottom > collider.rect.bottom:
@@ -1325,10 +1174,9 @@ class Level1(tools._State):
 
         else:
             enemy.rect.y += 1
-            test_group = pg.sprite.Group(self.ground_step_pipe_group,
-                                         self.coin_box_group,
-                                         self.brick_group)
-            if pg.sprite.spritecollideany(enemy, test_group) is None:
+            if spatial.collideany(enemy, self.ground_step_pipe_group,
+                                  self.coin_box_group,
+                                  self.brick_group) is None:
                 if enemy.state != c.JUMP:
                     enemy.state = c.FALL
 
@@ -1338,7 +1186,7 @@ class Level1(tools._State):
     def adjust_shell_position(self):
         """Moves any koopa in a shell along the x, y axes and checks for
         collisions"""
-        for shell in self.shell_group:
+        for shell in self.active_sprites(self.shell_group):
             shell.rect.x += shell.x_vel
             self.check_shell_x_collisions(shell)
 
@@ -1349,8 +1197,8 @@ class Level1(tools._State):
 
     def check_shell_x_collisions(self, shell):
         """Shell collisions along the x axis"""
-        collider = pg.sprite.spritecollideany(shell, self.ground_step_pipe_group)
-        enemy = pg.sprite.spritecollideany(shell, self.enemy_group)
+        collider = self.ground_step_pipe_group.collideany(shell)
+        enemy = self.enemy_group.collideany(shell)
 
         if collider:
             setup.SFX['bump'].play()
@@ -1374,7 +1222,7 @@ class Level1(tools._State):
 
     def check_shell_y_collisions(self, shell):
         """Shell collisions along the y axis"""
-        collider = pg.sprite.spritecollideany(shell, self.ground_step_pipe_group)
+        collider = self.ground_step_pipe_group.collideany(shell)
 
         if collider:
             shell.y_vel = 0
@@ -1383,14 +1231,14 @@ class Level1(tools._State):
 
         else:
             shell.rect.y += 1
-            if pg.sprite.spritecollideany(shell, self.ground_step_pipe_group) is None:
+            if self.ground_step_pipe_group.collideany(shell) is None:
                 shell.state = c.FALL
             shell.rect.y -= 1
 
 
     def adjust_powerup_position(self):
         """Moves mushrooms, stars and fireballs along the x, y axes"""
-        for powerup in self.powerup_group:
+        for powerup in self.active_sprites(self.powerup_group):
             if powerup.name == c.MUSHROOM:
                 self.adjust_mushroom_position(powerup)
             elif powerup.name == c.STAR:
@@ -1414,9 +1262,9 @@ class Level1(tools._State):
 
     def check_mushroom_x_collisions(self, mushroom):
         """Mushroom collisions along the x axis"""
-        collider = pg.sprite.spritecollideany(mushroom, self.ground_step_pipe_group)
-        brick = pg.sprite.spritecollideany(mushroom, self.brick_group)
-        coin_box = pg.sprite.spritecollideany(mushroom, self.coin_box_group)
+        collider = self.ground_step_pipe_group.collideany(mushroom)
+        brick = self.brick_group.collideany(mushroom)
+        coin_box = self.coin_box_group.collideany(mushroom)
 
         if collider:
             self.adjust_mushroom_for_collision_x(mushroom, collider)
@@ -1430,9 +1278,9 @@ class Level1(tools._State):
 
     def check_mushroom_y_collisions(self, mushroom):
         """Mushroom collisions along the y axis"""
-        collider = pg.sprite.spritecollideany(mushroom, self.ground_step_pipe_group)
-        brick = pg.sprite.spritecollideany(mushroom, self.brick_group)
-        coin_box = pg.sprite.spritecollideany(mushroom, self.coin_box_group)
+        collider = self.ground_step_pipe_group.collideany(mushroom)
+        brick = self.brick_group.collideany(mushroom)
+        coin_box = self.coin_box_group.collideany(mushroom)
 
         if collider:
             self.adjust_mushroom_for_collision_y(mushroom, collider)
@@ -1476,9 +1324,9 @@ class Level1(tools._State):
 
     def check_star_y_collisions(self, star):
         """Invincible star collisions along y axis"""
-        collider = pg.sprite.spritecollideany(star, self.ground_step_pipe_group)
-        brick = pg.sprite.spritecollideany(star, self.brick_group)
-        coin_box = pg.sprite.spritecollideany(star, self.coin_box_group)
+        collider = self.ground_step_pipe_group.collideany(star)
+        brick = self.brick_group.collideany(star)
+        coin_box = self.coin_box_group.collideany(star)
 
         if collider:
             self.adjust_star_for_collision_y(star, collider)
@@ -1529,13 +1377,8 @@ class Level1(tools._State):
 
     def check_fireball_x_collisions(self, fireball):
         """Fireball collisions along x axis"""
-        collide_group = pg.sprite.Group(self.ground_group,
-                                        self.pipe_group,
-                                        self.step_group,
-                                        self.coin_box_group,
-                                        self.brick_group)
-
-        collider = pg.sprite.spritecollideany(fireball, collide_group)
+        collider = spatial.collideany(fireball, self.ground_step_pipe_group,
+                                      self.coin_box_group, self.brick_group)
 
         if collider:
             fireball.kill()
@@ -1546,15 +1389,10 @@ class Level1(tools._State):
 
     def check_fireball_y_collisions(self, fireball):
         """Fireball collisions along y axis"""
-        collide_group = pg.sprite.Group(self.ground_group,
-                                        self.pipe_group,
-                                        self.step_group,
-                                        self.coin_box_group,
-                                        self.brick_group)
-
-        collider = pg.sprite.spritecollideany(fireball, collide_group)
-        enemy = pg.sprite.spritecollideany(fireball, self.enemy_group)
-        shell = pg.sprite.spritecollideany(fireball, self.shell_group)
+        collider = spatial.collideany(fireball, self.ground_step_pipe_group,
+                                      self.coin_box_group, self.brick_group)
+        enemy = self.enemy_group.collideany(fireball)
+        shell = self.shell_group.collideany(fireball)
 
         if collider and (fireball in self.powerup_group):
             fireball.rect.bottom = collider.rect.y
@@ -1585,7 +1423,7 @@ class Level1(tools._State):
         """Checks if sprite should enter a falling state"""
         sprite.rect.y += 1
 
-        if pg.sprite.spritecollideany(sprite, sprite_group) is None:
+        if sprite_group.collideany(sprite) is None:
             if sprite.state != c.JUMP:
                 sprite.state = c.FALL
 
@@ -1665,9 +1503,9 @@ class Level1(tools._State):
         elif self.overhead_info_display.time == 0:
             self.next = c.TIME_OUT
         else:
-            if self.mario.rect.x > 3670 \
+            if self.mario.rect.x > self.level_data.restart_after_x \
                     and self.game_info[c.CAMERA_START_X] == 0:
-                self.game_info[c.CAMERA_START_X] = 3440
+                self.game_info[c.CAMERA_START_X] = self.level_data.restart_x
             self.next = c.LOAD_SCREEN
 
 
@@ -1708,7 +1546,8 @@ class Level1(tools._State):
 
         if self.overhead_info_display.state == c.END_OF_LEVEL:
             self.state = c.FLAG_AND_FIREWORKS
-            self.flag_pole_group.add(castle_flag.Flag(8745, 322))
+            self.flag_pole_group.add(castle_flag.Flag(
+                *self.level_data.castle_flag))
 
 
     def update_flag_and_fireworks(self):
@@ -1734,20 +1573,23 @@ class Level1(tools._State):
 
     def blit_everything(self, surface):
         """Blit all sprites to the main surface"""
-        self.level.blit(self.background, self.viewport, self.viewport)
-        if self.flag_score:
-            self.flag_score.draw(self.level)
-        self.powerup_group.draw(self.level)
-        self.coin_group.draw(self.level)
-        self.brick_group.draw(self.level)
-        self.coin_box_group.draw(self.level)
-        self.sprites_about_to_die_group.draw(self.level)
-        self.shell_group.draw(self.level)
-        self.brick_pieces_group.draw(self.level)
-        self.flag_pole_group.draw(self.level)
-        self.mario_and_enemy_group.draw(self.level)
-
-        surface.blit(self.level, (0,0), self.viewport)
+        if (self.dirty_rendering and
+                self.viewport.x == self.drawn_viewport_x):
+            self.dirty_rects = self.blit_changes(surface)
+            return
+
+        self.static_layer.update(self.viewport)
+        surface.blit(self.static_layer.surface, (0, 0))
+        offset_x, offset_y = self.viewport.topleft
+        underneath = self.sprites_under_blocks()
+        for sprite in underneath:
+            surface.blit(sprite.image, sprite.rect.move(-offset_x, -offset_y))
+        # Bricks and coin boxes are on the static layer, below the sprites
+        # just drawn; put them back on top where they overlap.
+        self.static_layer.draw_over(surface, underneath, self.viewport)
+        for sprite in self.sprites_over_blocks():
+            surface.blit(sprite.image, sprite.rect.move(-offset_x, -offset_y))
+
         self.overhead_info_display.draw(surface)
         for score in self.moving_score_list:
             score.draw(surface)
@@ -1757,6 +1599,78 @@ class Level1(tools._State):
         # 绘制存档/读档消息
         self.draw_save_message(surface)
 
+        self.dirty_rects = None
+        if self.dirty_rendering:
+            self.level_tracker.collect(self.level_images())
+            self.screen_tracker.collect(self.screen_images(surface))
+            self.drawn_viewport_x = self.viewport.x
+        else:
+            self.drawn_viewport_x = None
+
+    def level_images(self):
+        """Everything blit_everything draws onto the level, in order"""
+        sprites = self.sprites_under_blocks()
+        for group in (self.brick_group, self.coin_box_group):
+            sprites.extend(self.visible_sprites(group))
+        sprites.extend(self.sprites_over_blocks())
+        return render.sprite_images(sprites)
+
+    def sprites_under_blocks(self):
+        """The sprites drawn before the bricks and coin boxes"""
+        sprites = []
+        if self.flag_score:
+            sprites.extend(self.flag_score.digit_list)
+        for group in (self.powerup_group, self.coin_group):
+            sprites.extend(self.visible_sprites(group))
+        return sprites
+
+    def sprites_over_blocks(self):
+        """The sprites drawn after the bricks and coin boxes"""
+        sprites = []
+        for group in (self.sprites_about_to_die_group, self.shell_group,
+                      self.brick_pieces_group, self.flag_pole_group,
+                      self.mario_and_enemy_group):
+            sprites.extend(self.visible_sprites(group))
+        return sprites
+
+    def visible_sprites(self, group):
+        """The sprites of an IndexedGroup close enough to the viewport to
+        be seen, in drawing order"""
+        group.reindex()
+        return group.query(self.viewport.inflate(c.DRAW_MARGIN * 2,
+                                                 c.DRAW_MARGIN * 2))
+
+    def screen_images(self, surface):
+        """Everything blit_everything draws over the level, in order"""
+        images = self.overhead_info_display.level_screen_images()
+        for score in self.moving_score_list:
+            images.extend(render.sprite_images(score.digit_list))
+        images.extend(self.cheat_indicator_images())
+        images.extend(self.save_message_images(surface))
+        return images
+
+    def blit_changes(self, surface):
+        """Redraws only the areas that changed since the last frame, while
+        the camera stands still.  Returns those areas in screen
+        coordinates."""
+        level_images = self.level_images()
+        screen_images = self.screen_images(surface)
+        offset_x, offset_y = self.viewport.topleft
+
+        rects = [rect.clip(self.viewport).move(-offset_x, -offset_y)
+                 for rect in self.level_tracker.collect(level_images)]
+        rects.extend(self.screen_tracker.collect(screen_images))
+        rects = render.merge_rects(rect.clip(surface.get_rect())
+                                   for rect in rects)
+
+        # The blocks are on the layer too; drawing them again over
+        # themselves changes nothing
+        self.static_layer.update(self.viewport)
+        self.static_layer.draw_background(surface, rects)
+        render.redraw(surface, level_images, rects, self.viewport.topleft)
+        render.redraw(surface, screen_images, rects)
+        return rects
+
     def take_screenshot(self, surface):
         """截图并保存到pictures文件夹"""
         # 获取当前文件所在目录的父级目录
@@ -1769,7 +1683,7 @@ class Level1(tools._State):
             os.makedirs(pictures_dir)
     
         # 生成截图文件名（包含时间戳和计数器）
-        timestamp = pg.time.get_ticks()
+        timestamp = int(self.current_time)
         self.screenshot_counter += 1
         filename = f"screenshot_{self.screenshot_counter}_{timestamp}.png"
         filepath = os.path.join(pictures_dir, filename)
@@ -1794,33 +1708,42 @@ class Level1(tools._State):
 
     def draw_cheat_indicator(self, surface):
         """在屏幕上绘制作弊模式指示器和截图提示"""
+        for image, position in self.cheat_indicator_images():
+            surface.blit(image, position)
+
+    def cheat_indicator_images(self):
+        """作弊模式指示器和截图提示的图片及位置"""
+        images = []
         if self.cheat_mode:
-            font = pg.font.SysFont('Arial', 20)
-            text = font.render("CHEAT MODE: GOD MODE + 9999 LIVES", True, (255, 255, 0))
-            surface.blit(text, (10, 50))
+            image = text.render("CHEAT MODE: GOD MODE + 9999 LIVES", 20, (255, 255, 0))
+            images.append((image, (10, 50)))
     
         # 显示截图提示
         if hasattr(self, 'screenshot_message_timer'):
             elapsed = self.current_time - self.screenshot_message_timer
             if elapsed < self.screenshot_message_duration:
-                font = pg.font.SysFont('Arial', 20)
-                text = font.render(self.screenshot_message, True, (0, 255, 0))
-                surface.blit(text, (10, 80))
+                image = text.render(self.screenshot_message, 20, (0, 255, 0))
+                images.append((image, (10, 80)))
     
         # 显示作弊模式
         if hasattr(self, 'cheat_message_timer'):
             elapsed = self.current_time - self.cheat_message_timer
             if elapsed < self.cheat_message_duration:
-                font = pg.font.SysFont('Arial', 20)
-                text = font.render(self.cheat_message, True, (255, 255, 0))
-                surface.blit(text, (10, 110))
+                image = text.render(self.cheat_message, 20, (255, 255, 0))
+                images.append((image, (10, 110)))
+        return images
 
     def draw_save_message(self, surface):
         """在屏幕上绘制存档/读档消息"""
+        for image, position in self.save_message_images(surface):
+            surface.blit(image, position)
+
+    def save_message_images(self, surface):
+        """存档/读档消息的图片及位置"""
         if hasattr(self, 'save_message_timer'):
             elapsed = self.current_time - self.save_message_timer
             if elapsed < self.save_message_duration:
-                font = pg.font.SysFont('Arial', 24)
-                text = font.render(self.save_message, True, (255, 255, 0))
-                text_rect = text.get_rect(center=(surface.get_width()//2, 100))
-                surface.blit(text, text_rect)
+                image = text.render(self.save_message, 24, (255, 255, 0))
+                text_rect = image.get_rect(center=(surface.get_width()//2, 100))
+                return [(image, text_rect.topleft)]
+        return []
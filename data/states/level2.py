@@ -3,6 +3,7 @@ from __future__ import division
 import os
 import pickle
 import random
+import weakref
 
 import pygame as pg
 from .. import setup, tools
@@ -27,7 +28,8 @@ class Level2(tools._State):
     def __init__(self):
         tools._State.__init__(self)
 
-        # 随机地形
+        # 随机地形，用自己的随机数生成器，设定种子后可以重现
+        self.random = random.Random()
         self.random_terrain_group = pg.sprite.Group()
         self.last_terrain_generation_time = 0
         self.terrain_generation_interval = 10000
@@ -40,6 +42,9 @@ class Level2(tools._State):
 
         # 固定砖块组
         self.fixed_terrain_group = pg.sprite.Group()
+
+        # 平台碰撞组：地面、固定砖块和随机地形，只在地形变化时重建
+        self.platform_group = pg.sprite.Group()
         
         # 截图相关属性（新增）
         self.screenshot_count = 0
@@ -57,7 +62,7 @@ class Level2(tools._State):
             os.makedirs(pictures_dir)
     
         # 生成截图文件名（包含时间戳和计数器）
-        timestamp = pg.time.get_ticks()
+        timestamp = int(self.current_time)
         self.screenshot_count += 1
         filename = f"screenshot_{self.screenshot_count}_{timestamp}.png"
         filepath = os.path.join(pictures_dir, filename)
@@ -76,13 +81,17 @@ class Level2(tools._State):
         self.handle_states(keys)
         self.check_boss_spawn_logic()
         self.check_if_time_out()
-        self.blit_everything(surface)
+        if self.rendering:
+            self.blit_everything(surface)
         self.sound_manager.update(self.game_info, self.mario)
 
         # 检查截图快捷键 F12（新增）
         if keys[pg.K_g]:
             self.take_screenshot(surface)
 
+    def seed(self, seed):
+        self.random.seed(seed)
+
     # ------------------------------------------------------------------
     def startup(self, current_time, persist):
         self.game_info = persist
@@ -152,18 +161,26 @@ class Level2(tools._State):
             target_width = screen_width
             target_height = int(target_width * 2 / 3)
 
-        self.background = pg.transform.scale(self.background,
-                                             (target_width, target_height))
+        self.background = tools.get_frame(self.background, self.back_rect,
+                                          (target_width, target_height), None)
         self.back_rect = self.background.get_rect()
 
         self.level_width = self.back_rect.width
         self.level_height = self.back_rect.height
 
-        self.level = pg.Surface((self.level_width, self.level_height)).convert()
-        self.level_rect = self.level.get_rect()
+        self.level_rect = pg.Rect(0, 0, self.level_width, self.level_height)
         self.viewport = setup.SCREEN.get_rect(bottom=self.level_rect.bottom)
         self.viewport.x = self.game_info[c.CAMERA_START_X]
 
+        # 整个关卡缩放到屏幕大小显示。背景只缩放一次，精灵图片按需缩放
+        # 后缓存，每帧不再缩放整张关卡表面
+        screen_width, screen_height = setup.SCREEN_RECT.size
+        self.scale_x = screen_width / self.level_width
+        self.scale_y = screen_height / self.level_height
+        self.screen_background = tools.get_frame(
+            self.background, self.back_rect, setup.SCREEN_RECT.size, None)
+        self.screen_frames = weakref.WeakKeyDictionary()
+
     # ------------------------------------------------------------------
     def setup_ground(self):
         ground_y = self.level_height - 60
@@ -183,6 +200,7 @@ class Level2(tools._State):
         # 将固定砖块和地面都添加到碰撞组
         self.ground_step_pipe_group = pg.sprite.Group(self.ground_group)
         self.ground_step_pipe_group.add(self.fixed_terrain_group)
+        self.rebuild_platforms()
         
         # 创建专门的敌人组
         self.enemy_group = pg.sprite.Group()
@@ -219,14 +237,14 @@ class Level2(tools._State):
         fixed_end_x = self.level_width * 3 // 4
         fixed_height = self.level_height - 200  # 与setup_fixed_terrain中的高度保持一致
 
-        num_blocks = random.randint(3, self.max_terrain_blocks)
+        num_blocks = self.random.randint(3, self.max_terrain_blocks)
         attempts = 0
 
         while len(self.random_terrain_group) < num_blocks and attempts < 50:
             attempts += 1
 
-            x = random.randint(50, self.level_width - 80)
-            y = random.randint(100, self.level_height - 120)
+            x = self.random.randint(50, self.level_width - 80)
+            y = self.random.randint(100, self.level_height - 120)
 
             # 避开固定砖块区域
             if fixed_start_x <= x <= fixed_end_x and abs(y - fixed_height) < 100:
@@ -243,6 +261,14 @@ class Level2(tools._State):
             self.random_terrain_group.add(block)
             existing_blocks.append(rect)
 
+        self.rebuild_platforms()
+
+    def rebuild_platforms(self):
+        """地形变化后重建平台碰撞组，敌人、Boss和Mario的下落检测都查询它"""
+        self.platform_group.empty()
+        self.platform_group.add(self.ground_step_pipe_group,
+                                self.random_terrain_group)
+
     def update_random_terrain(self, current_time):
         if current_time - self.last_terrain_generation_time > self.terrain_generation_interval:
             self.generate_random_terrain()
@@ -351,11 +377,8 @@ class Level2(tools._State):
                     continue
 
             # 使用 Enemy/Boss 自带 update 函数
-            platforms_group = pg.sprite.Group(self.ground_step_pipe_group,
-                                          self.random_terrain_group)
-        
             # 改为使用位置参数而不是关键字参数
-            sprite.update(self.game_info, platforms_group)  # 移除了 game_info= 和 platforms=
+            sprite.update(self.game_info, self.platform_group)  # 移除了 game_info= 和 platforms=
 
         # 更新即将死亡的精灵
         self.sprites_about_to_die_group.update(self.game_info)
@@ -430,9 +453,7 @@ class Level2(tools._State):
 
     def test_if_mario_is_falling(self):
         self.mario.rect.y += 1
-        test_group = pg.sprite.Group(self.ground_step_pipe_group,
-                                     self.random_terrain_group)
-        if pg.sprite.spritecollideany(self.mario, test_group) is None:
+        if pg.sprite.spritecollideany(self.mario, self.platform_group) is None:
             if self.mario.state not in (c.JUMP, c.DEATH_JUMP):
                 self.mario.state = c.FALL
         self.mario.rect.y -= 1
@@ -520,21 +541,35 @@ class Level2(tools._State):
 
     def blit_everything(self, surface):
         """绘制所有内容"""
-        surface.fill((92, 148, 252))
-        self.level.fill((92, 148, 252))
-        self.level.blit(self.background, (0, 0))
+        surface.blit(self.screen_background, (0, 0))
 
         # 绘制地形和精灵
-        self.random_terrain_group.draw(self.level)
-        self.fixed_terrain_group.draw(self.level)  # 绘制固定砖块
-        self.mario_and_enemy_group.draw(self.level)
-        self.sprites_about_to_die_group.draw(self.level)  # 新增绘制即将死亡的精灵
-
-        scaled = pg.transform.scale(self.level, surface.get_size())
-        surface.blit(scaled, (0, 0))
+        for group in (self.random_terrain_group,
+                      self.fixed_terrain_group,  # 固定砖块
+                      self.mario_and_enemy_group,
+                      self.sprites_about_to_die_group):  # 即将死亡的精灵
+            for sprite in group:
+                self.blit_scaled(surface, sprite.image, sprite.rect)
 
         self.overhead_info_display.draw(surface)
 
+    def blit_scaled(self, surface, image, rect):
+        """把关卡坐标下的图片按屏幕比例画到surface上"""
+        scaled = self.screen_frames.get(image)
+        if scaled is None:
+            width, height = image.get_size()
+            if not width or not height:
+                return
+            size = (max(1, int(round(width * self.scale_x))),
+                    max(1, int(round(height * self.scale_y))))
+            scaled = pg.transform.scale(image, size)
+            self.screen_frames[image] = scaled
+        # 共享的帧可能被改过透明度（无敌闪烁），每次同步
+        if scaled.get_alpha() != image.get_alpha():
+            scaled.set_alpha(image.get_alpha())
+        surface.blit(scaled, (int(round(rect.x * self.scale_x)),
+                              int(round(rect.y * self.scale_y))))
+
     def check_if_mario_in_transition_state(self):
         if self.mario.in_transition_state:
             self.game_info[c.LEVEL_STATE] = self.state = c.FROZEN
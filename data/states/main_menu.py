@@ -1,7 +1,7 @@
 __author__ = 'justinarmstrong'
 
 import pygame as pg
-from .. import setup, tools
+from .. import setup, tools, tilemap
 from .. import constants as c
 from .. components import info, mario
 
@@ -96,13 +96,15 @@ class Menu(tools._State):
 
 
     def setup_background(self):
-        """Setup the background image to blit"""
-        self.background = setup.GFX['level_1']
-        self.background_rect = self.background.get_rect()
-        self.background = pg.transform.scale(self.background,
-                                   (int(self.background_rect.width*c.BACKGROUND_MULTIPLER),
-                                    int(self.background_rect.height*c.BACKGROUND_MULTIPLER)))
-        self.viewport = setup.SCREEN.get_rect(bottom=setup.SCREEN_RECT.bottom)
+        """Setup the background image to blit.  Only the first screen of
+        the level is shown, so only that much is scaled, through the same
+        tile map Level1 draws from."""
+        source = setup.GFX['level_1']
+        size = (int(source.get_width() * c.BACKGROUND_MULTIPLER),
+                int(source.get_height() * c.BACKGROUND_MULTIPLER))
+        self.viewport = setup.SCREEN.get_rect(bottom=size[1])
+        self.background = pg.Surface(self.viewport.size).convert()
+        tilemap.get(source, size).draw(self.background, self.viewport)
 
         self.image_dict = {}
         self.image_dict['GAME_NAME_BOX'] = self.get_image(
@@ -163,7 +165,7 @@ class Menu(tools._State):
         self.overhead_info.update(self.game_info)
 
         # 先绘制背景
-        surface.blit(self.background, self.viewport, self.viewport)
+        surface.blit(self.background, (0, 0))
         surface.blit(self.image_dict['GAME_NAME_BOX'][0],
                     self.image_dict['GAME_NAME_BOX'][1])
         
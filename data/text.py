@@ -0,0 +1,41 @@
+"""
+Cached text rendering for HUD messages and overlays.
+
+Each font is resolved once per (name, size).  Rendered strings are kept
+in an LRU cache, so a message shown every frame is rasterised once and
+then only blitted.  The cached surfaces are shared and must not be drawn
+on.
+"""
+
+from collections import OrderedDict
+import pygame as pg
+
+CACHE_SIZE = 256
+
+_fonts = {}
+_rendered = OrderedDict()
+
+
+def get_font(name, size):
+    """pg.font.SysFont, looked up only the first time"""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pg.font.SysFont(name, size)
+        _fonts[key] = font
+    return font
+
+
+def render(message, size, color, name='Arial'):
+    """Returns the antialiased image of message, from the cache if it was
+    rendered recently"""
+    key = (name, size, message, tuple(color))
+    image = _rendered.get(key)
+    if image is None:
+        image = get_font(name, size).render(message, True, color)
+        _rendered[key] = image
+        if len(_rendered) > CACHE_SIZE:
+            _rendered.popitem(last=False)
+    else:
+        _rendered.move_to_end(key)
+    return image
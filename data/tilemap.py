@@ -0,0 +1,176 @@
+"""
+Tile map background.
+
+The 1-1 background is mostly sky, ground and a few bushes, clouds and
+hills, repeated.  TileMap cuts the unscaled image into TILE_SIZE squares,
+keeps each distinct square once and records which one goes where.  Only
+the tiles under the camera are scaled and composed into a screen sized
+buffer; when the camera moves the buffer is scrolled and only the columns
+it uncovers are drawn.  Level1 composes the tiles into a
+render.StaticLayer instead, which keeps the bricks and coin boxes drawn
+on them.
+
+Tiles are scaled with the same row and column picks pg.transform.scale
+uses for the whole image, so the result is pixel for pixel the scaled
+background.
+"""
+
+from bisect import bisect_right
+import pygame as pg
+from . import render
+
+TILE_SIZE = 16
+
+_maps = {}
+_scale_maps = {}
+
+
+def get(source, size):
+    """The TileMap of source scaled to size, built only the first time"""
+    key = (source, tuple(size))
+    tile_map = _maps.get(key)
+    if tile_map is None:
+        tile_map = TileMap(source, size)
+        _maps[key] = tile_map
+    return tile_map
+
+
+def scale_map(source_length, length):
+    """The source pixel pg.transform.scale copies into each of the length
+    pixels of a row it stretches, found by scaling numbered pixels.  Rows
+    and columns are picked the same way."""
+    key = (source_length, length)
+    if key in _scale_maps:
+        return _scale_maps[key]
+    row = pg.Surface((source_length, 1), 0, 32)
+    for x in range(source_length):
+        row.set_at((x, 0), (x & 0xff, x >> 8, 0))
+    scaled = pg.transform.scale(row, (length, 1))
+    picks = []
+    for x in range(length):
+        red, green = scaled.get_at((x, 0))[:2]
+        picks.append(red | green << 8)
+    _scale_maps[key] = picks
+    return picks
+
+
+def stretch(image, columns, rows):
+    """image scaled by taking its columns and rows at the given indexes"""
+    flags = image.get_flags() & pg.SRCALPHA
+    height = image.get_height()
+    wide = pg.Surface((len(columns), height), flags, image)
+    # Adding to a blank image copies the pixels, alpha included
+    wide.blits([(image, (x, 0), (column, 0, 1, height), pg.BLEND_RGBA_ADD)
+                for x, column in enumerate(columns)], False)
+    scaled = pg.Surface((len(columns), len(rows)), flags, image)
+    scaled.blits([(wide, (0, y), (0, row, len(columns), 1),
+                   pg.BLEND_RGBA_ADD) for y, row in enumerate(rows)], False)
+    return scaled
+
+
+def tile_spans(picks, count, tile_size):
+    """Where each of count tiles starts once scaled, plus the end, and the
+    pixels of its own it is scaled from"""
+    starts = []
+    offsets = []
+    position = 0
+    for tile in range(count):
+        first = tile * tile_size
+        start = position
+        while position < len(picks) and picks[position] < first + tile_size:
+            position += 1
+        starts.append(start)
+        offsets.append(tuple(pick - first for pick in picks[start:position]))
+    starts.append(position)
+    return starts, offsets
+
+
+class TileMap(object):
+    """The background image source scaled to size, kept as distinct tiles
+    and a grid of tile numbers"""
+    def __init__(self, source, size, tile_size=TILE_SIZE):
+        width, height = size
+        source_width, source_height = source.get_size()
+        columns = -(-source_width // tile_size)
+        rows = -(-source_height // tile_size)
+
+        self.tiles = []
+        self.uniform = []
+        self.grid = []
+        numbers = {}
+        for row in range(rows):
+            grid_row = []
+            for column in range(columns):
+                rect = pg.Rect(column * tile_size, row * tile_size,
+                               tile_size, tile_size).clip(source.get_rect())
+                tile = source.subsurface(rect)
+                pixels = pg.image.tobytes(tile, 'RGBA')
+                number = numbers.get(pixels)
+                if number is None:
+                    number = numbers[pixels] = len(self.tiles)
+                    self.tiles.append(tile.copy())
+                    self.uniform.append(
+                        pixels == pixels[:4] * (len(pixels) // 4))
+                grid_row.append(number)
+            self.grid.append(grid_row)
+
+        self.x_starts, self.x_offsets = tile_spans(
+            scale_map(source_width, width), columns, tile_size)
+        self.y_starts, self.y_offsets = tile_spans(
+            scale_map(source_height, height), rows, tile_size)
+        self.scaled = {}
+        self.buffer = None
+        self.shown = None
+
+    def scaled_tile(self, column, row):
+        number = self.grid[row][column]
+        columns = self.x_offsets[column]
+        rows = self.y_offsets[row]
+        if self.uniform[number]:
+            # Every pick gives the same colour, only the size matters
+            key = (number, len(columns), len(rows))
+        else:
+            key = (number, columns, rows)
+        image = self.scaled.get(key)
+        if image is None:
+            image = stretch(self.tiles[number], columns, rows)
+            self.scaled[key] = image
+        return image
+
+    def draw_area(self, surface, area, viewport):
+        """Composes the tiles under area (in level coordinates) into
+        surface, which shows viewport"""
+        local = area.move(-viewport.x, -viewport.y)
+        surface.fill((0, 0, 0), local)
+        surface.set_clip(local)
+        first_column = max(0, bisect_right(self.x_starts, area.left) - 1)
+        last_column = min(len(self.x_offsets),
+                          bisect_right(self.x_starts, area.right - 1))
+        first_row = max(0, bisect_right(self.y_starts, area.top) - 1)
+        last_row = min(len(self.y_offsets),
+                       bisect_right(self.y_starts, area.bottom - 1))
+        blits = []
+        for row in range(first_row, last_row):
+            y = self.y_starts[row] - viewport.y
+            for column in range(first_column, last_column):
+                blits.append((self.scaled_tile(column, row),
+                              (self.x_starts[column] - viewport.x, y)))
+        surface.blits(blits, False)
+        surface.set_clip(None)
+
+    def compose(self, viewport):
+        """Brings the buffer up to date with viewport, drawing only what
+        scrolled into view"""
+        if self.buffer is None or self.buffer.get_size() != viewport.size:
+            self.buffer = pg.Surface(viewport.size).convert()
+            self.shown = None
+        exposed = render.scroll(self.buffer, self.shown, viewport)
+        if exposed is None:
+            return
+        self.draw_area(self.buffer, exposed, viewport)
+        self.shown = pg.Rect(viewport)
+
+    def draw(self, surface, viewport):
+        """Blits the background under viewport to surface"""
+        self.compose(viewport)
+        surface.blit(self.buffer, (0, 0))
@@ -1,8 +1,14 @@
 __author__ = 'justinarmstrong'
 
 import os
+import time
 import pygame as pg
 from . import constants as c
+from . import text
+from .profiler import FrameProfiler
+
+# Game speeds F8 cycles through
+SPEEDS = (1, 2, 4)
 
 keybinding = {
     'action':pg.K_w,
@@ -12,19 +18,109 @@ keybinding = {
     'down':pg.K_s
 }
 
+
+class KeyState(object):
+    """Stand-in for the sequence returned by pg.key.get_pressed(), built
+    from the key constants that are held down.  Used to drive the game
+    without a keyboard."""
+    def __init__(self, pressed=()):
+        self.pressed = frozenset(pressed)
+
+    @classmethod
+    def from_actions(cls, *actions):
+        """Builds a key state from keybinding names ('left', 'jump'...)"""
+        return cls(keybinding[action] for action in actions)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+class StartupTimer(object):
+    """Records how long each startup phase takes, up to the first frame.
+    The report is printed when MARIO_TIMING=1 is set."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase):
+        """Ends the current phase, naming it phase"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        """Prints the phases once, if timing was asked for"""
+        if self.reported:
+            return
+        self.reported = True
+        if os.environ.get('MARIO_TIMING') != '1':
+            return
+        print("启动耗时:")
+        for phase, seconds in self.phases:
+            print("  {:<16}{:8.1f} ms".format(phase, seconds * 1000))
+        print("  {:<16}{:8.1f} ms".format('total', (self.last - self.start) * 1000))
+
+
+# Started as soon as the game imports tools, i.e. right after pygame
+startup_timer = StartupTimer()
+
+
+class GameClock(object):
+    """Game time.  It only moves when Control steps a tick, and always by
+    exactly 1/tick_rate of a second, so timers run the same at any speed,
+    while paused or frame stepping and in headless runs.  Nothing in the
+    game should read the wall clock (pg.time.get_ticks) instead."""
+    def __init__(self, tick_rate=60):
+        self.tick_rate = tick_rate
+        self.ticks = 0
+        self.time = 0.0
+
+    @property
+    def tick_ms(self):
+        return 1000.0 / self.tick_rate
+
+    def advance(self):
+        """Moves time on by one tick"""
+        self.ticks += 1
+        self.time += self.tick_ms
+
+    def get_ticks(self):
+        """Game time in whole milliseconds, like pg.time.get_ticks()"""
+        return int(self.time)
+
+
 class Control(object):
     """Control class for entire project. Contains the game loop, and contains
     the event_loop which passes events to States as needed. Logic for flipping
     states is also found here."""
-    def __init__(self, caption):
+    def __init__(self, caption, rendering=True):
         self.screen = pg.display.get_surface()
         self.done = False
         self.clock = pg.time.Clock()
         self.caption = caption
         self.fps = 60
         self.show_fps = False
-        self.current_time = 0.0
+        self.profiler = FrameProfiler()
+        self.rendering = rendering
+        # Dirty rectangle rendering (F4, or MARIO_DIRTY_RECTS=1): states
+        # that support it redraw and send only the changed screen areas.
+        self.dirty_rendering = os.environ.get('MARIO_DIRTY_RECTS') == '1'
+        self.overlay_shown = False
+        # Simulation runs at a fixed tick rate, independent of the frame
+        # rate.  A slow frame is caught up with at most max_catch_up_ticks
+        # extra ticks before the game is allowed to fall behind.
+        self.game_clock = GameClock(60)
+        self.max_catch_up_ticks = 5
+        # Real time to game time: F10 pauses, F11 steps one tick while
+        # paused, F8 cycles through SPEEDS.
+        self.paused = False
+        self.step_requested = False
+        self.speed = 1
         self.keys = pg.key.get_pressed()
+        # replay.Recorder that keeps the key state of every tick, if any
+        self.recorder = None
         self.state_dict = {}
         self.state_name = None
         self.state = None
@@ -33,6 +129,7 @@ class Control(object):
         self.show_save_menu = False
         self.save_menu_cursor = 1
         self.save_menu_mode = 'save'
+        self.save_menu_background = None
 
     def setup_states(self, state_dict, start_state):
         self.state_dict = state_dict
@@ -40,7 +137,8 @@ class Control(object):
         self.state = self.state_dict[self.state_name]
         # 初始化存档管理器
         from .save_manager import SaveManager
-        self.save_manager = SaveManager()
+        self.save_manager = SaveManager(self.game_clock)
+        startup_timer.mark('states')
 
     def event_loop(self):
         for event in pg.event.get():
@@ -142,15 +240,30 @@ class Control(object):
     def show_quick_message(self, message):
         """显示快速操作提示"""
         self.quick_message = message
-        self.quick_message_timer = self.current_time
+        self.quick_message_box = None
+        self.quick_message_timer = self.game_clock.time
 
-    def update(self):
-        self.current_time = pg.time.get_ticks()
+    def update(self, draw=True):
+        """Runs one tick of the current state at the game clock's time.
+        The state only draws to the screen if draw is set."""
         if self.state.quit:
             self.done = True
         elif self.state.done:
             self.flip_state()
-        self.state.update(self.screen, self.keys, self.current_time)
+        draw = draw and self.rendering
+        self.state.rendering = draw
+        if draw:
+            # Overlays are drawn over the state, so a frame with one and
+            # the frame after it have to be drawn in full.
+            overlay_shown = self.overlay_visible()
+            self.state.dirty_rendering = (self.dirty_rendering and
+                                          not overlay_shown and
+                                          not self.overlay_shown)
+            self.overlay_shown = overlay_shown
+        self.state.update(self.screen, self.keys, self.game_clock.time)
+
+        if not draw:
+            return
 
         # 更新存档菜单显示
         if self.show_save_menu:
@@ -158,9 +271,16 @@ class Control(object):
         
         # 显示快速操作提示
         if hasattr(self, 'quick_message_timer'):
-            if self.current_time - self.quick_message_timer < 2000:  # 显示2秒
+            if self.game_clock.time - self.quick_message_timer < 2000:  # 显示2秒
                 self.draw_quick_message()
 
+    def overlay_visible(self):
+        """True if anything will be drawn over the state this frame"""
+        if self.show_save_menu or self.profiler.enabled:
+            return True
+        return (hasattr(self, 'quick_message_timer') and
+                self.game_clock.time - self.quick_message_timer < 2000)
+
     def draw_save_menu(self):
         """绘制存档菜单"""
         # 只在Level1状态下显示存档菜单
@@ -168,32 +288,21 @@ class Control(object):
             self.show_save_menu = False
             return
         
-        # 创建半透明背景
-        overlay = pg.Surface(self.screen.get_size())
-        overlay.set_alpha(180)
-        overlay.fill((0, 0, 0))
-        self.screen.blit(overlay, (0, 0))
+        # 半透明背景和菜单框只创建一次
+        if self.save_menu_background is None:
+            self.save_menu_background = self.create_save_menu_background()
+        self.screen.blit(self.save_menu_background, (0, 0))
         
-        # 绘制存档菜单
         menu_width, menu_height = 400, 300
         menu_x = (self.screen.get_width() - menu_width) // 2
         menu_y = (self.screen.get_height() - menu_height) // 2
         
-        # 菜单背景
-        menu_bg = pg.Surface((menu_width, menu_height))
-        menu_bg.fill((50, 50, 50))
-        menu_border = pg.Rect(0, 0, menu_width, menu_height)
-        pg.draw.rect(menu_bg, (255, 255, 255), menu_border, 3)
-        self.screen.blit(menu_bg, (menu_x, menu_y))
-        
         # 标题
-        font = pg.font.SysFont('Arial', 32)
         title_text = "存档管理" if self.save_menu_mode == 'save' else "读取存档"
-        title = font.render(title_text, True, (255, 255, 255))
+        title = text.render(title_text, 32, (255, 255, 255))
         self.screen.blit(title, (menu_x + (menu_width - title.get_width()) // 2, menu_y + 20))
         
         # 存档槽位信息
-        slot_font = pg.font.SysFont('Arial', 24)
         for i in range(1, 4):
             slot_info = self.save_manager.get_slot_info(i)
             y_pos = menu_y + 80 + (i-1)*60
@@ -204,17 +313,16 @@ class Control(object):
                            (menu_x + 50, y_pos - 5, menu_width - 100, 40))
             
             if slot_info['exists']:
-                text = f"槽位 {i}: 分数 {slot_info['score']} | 生命 {slot_info['lives']} | 金币 {slot_info['coins']}"
+                slot_label = f"槽位 {i}: 分数 {slot_info['score']} | 生命 {slot_info['lives']} | 金币 {slot_info['coins']}"
                 color = (255, 255, 255)
             else:
-                text = f"槽位 {i}: 空"
+                slot_label = f"槽位 {i}: 空"
                 color = (150, 150, 150)
             
-            slot_text = slot_font.render(text, True, color)
+            slot_text = text.render(slot_label, 24, color)
             self.screen.blit(slot_text, (menu_x + 60, y_pos))
         
         # 操作提示
-        hint_font = pg.font.SysFont('Arial', 18)
         hints = [
             "↑↓: 选择槽位  Enter: 确认  ESC: 退出",
             "F5: 快速存档  F9: 快速读档"
@@ -224,32 +332,47 @@ class Control(object):
             hints.append("D: 删除选中存档")
         
         for i, hint in enumerate(hints):
-            hint_text = hint_font.render(hint, True, (200, 200, 200))
+            hint_text = text.render(hint, 18, (200, 200, 200))
             self.screen.blit(hint_text, (menu_x + (menu_width - hint_text.get_width()) // 2, 
                                        menu_y + menu_height - 60 + i*25))
 
-    def draw_quick_message(self):
-        """绘制快速操作提示"""
-        font = pg.font.SysFont('Arial', 24)
-        text = font.render(self.quick_message, True, (255, 255, 0))
-        text_rect = text.get_rect(center=(self.screen.get_width() // 2, 100))
+    def create_save_menu_background(self):
+        """半透明遮罩加上菜单框，合成一张图"""
+        background = pg.Surface(self.screen.get_size(), pg.SRCALPHA)
+        background.fill((0, 0, 0, 180))
         
-        # 添加背景
-        bg_rect = text_rect.inflate(20, 10)
-        bg_surface = pg.Surface((bg_rect.width, bg_rect.height))
-        bg_surface.set_alpha(200)
-        bg_surface.fill((0, 0, 0))
-        self.screen.blit(bg_surface, bg_rect)
+        menu_width, menu_height = 400, 300
+        menu_x = (self.screen.get_width() - menu_width) // 2
+        menu_y = (self.screen.get_height() - menu_height) // 2
         
-        # 绘制文字
-        self.screen.blit(text, text_rect)
+        menu_bg = pg.Surface((menu_width, menu_height))
+        menu_bg.fill((50, 50, 50))
+        menu_border = pg.Rect(0, 0, menu_width, menu_height)
+        pg.draw.rect(menu_bg, (255, 255, 255), menu_border, 3)
+        background.blit(menu_bg, (menu_x, menu_y))
+        return background
+
+    def draw_quick_message(self):
+        """绘制快速操作提示"""
+        # 提示框（背景加文字）在消息改变时才重新生成
+        if self.quick_message_box is None:
+            message = text.render(self.quick_message, 24, (255, 255, 0))
+            box_rect = message.get_rect().inflate(20, 10)
+            self.quick_message_box = pg.Surface(box_rect.size, pg.SRCALPHA)
+            self.quick_message_box.fill((0, 0, 0, 200))
+            self.quick_message_box.blit(message, (10, 5))
+        box_rect = self.quick_message_box.get_rect(
+            center=(self.screen.get_width() // 2, 100))
+        self.screen.blit(self.quick_message_box, box_rect)
 
     def flip_state(self):
         previous, self.state_name = self.state_name, self.state.next
         persist = self.state.cleanup()
         self.state = self.state_dict[self.state_name]
-        self.state.startup(self.current_time, persist)
+        self.state.startup(self.game_clock.time, persist)
         self.state.previous = previous
+        if self.profiler.enabled:
+            self.profiler.attach(self)
 
 
     def event_loop(self):
@@ -258,18 +381,33 @@ class Control(object):
                 self.done = True
             elif event.type == pg.KEYDOWN:
                 self.keys = pg.key.get_pressed()
-                # 检测 F 键作弊
                 self.toggle_show_fps(event.key)
-                if event.key == pg.K_f:
-                    self.toggle_cheat_mode()
+                self.toggle_profiler(event.key)
+                self.toggle_dirty_rendering(event.key)
+                self.change_speed(event.key)
+                self.key_down(event.key)
             elif event.type == pg.KEYUP:
                 self.keys = pg.key.get_pressed()
             self.state.get_event(event)
+
+    def key_down(self, key):
+        """Game actions triggered by pressing a key rather than holding it.
+        Replays call this for the presses they recorded."""
+        # 检测 F 键作弊
+        if key == pg.K_f:
+            self.toggle_cheat_mode()
+
     def toggle_cheat_mode(self):
         """切换作弊模式"""
-        # 如果当前状态是Level1，则调用其作弊方法
+        # 如果当前状态是Level1，则调用其作弊方法（用游戏时间，回放才能重现）
         if hasattr(self.state, 'toggle_cheat_mode'):
-            self.state.toggle_cheat_mode(pg.time.get_ticks())
+            self.state.toggle_cheat_mode(self.game_clock.time)
+
+    def seed(self, seed):
+        """Seeds the random numbers of every state, so that the same
+        keys give the same run"""
+        for state in self.state_dict.values():
+            state.seed(seed)
 
 
     def toggle_show_fps(self, key):
@@ -279,12 +417,81 @@ class Control(object):
                 pg.display.set_caption(self.caption)
 
 
+    def toggle_profiler(self, key):
+        if key == pg.K_F3:
+            self.profiler.toggle(self)
+
+
+    def toggle_dirty_rendering(self, key):
+        if key == pg.K_F4:
+            self.dirty_rendering = not self.dirty_rendering
+
+
+    def change_speed(self, key):
+        """F10 pauses, F11 runs a single tick while paused, F8 changes how
+        many ticks run per real tick"""
+        if key == pg.K_F10:
+            self.paused = not self.paused
+        elif key == pg.K_F11 and self.paused:
+            self.step_requested = True
+        elif key == pg.K_F8:
+            self.speed = SPEEDS[(SPEEDS.index(self.speed) + 1) % len(SPEEDS)]
+        else:
+            return
+        status = [self.caption]
+        if self.paused:
+            status.append('暂停')
+        if self.speed != 1:
+            status.append('x{}'.format(self.speed))
+        pg.display.set_caption(' - '.join(status))
+
+
     def main(self):
-        """Main loop for entire program"""
+        """Main loop for entire program.  Game time advances in fixed ticks;
+        only the last tick run in a frame is drawn and sent to the display.
+        The wall clock is only read here, to decide how many ticks are
+        due."""
+        tick_ms = self.game_clock.tick_ms
+        previous = pg.time.get_ticks()
+        lag = tick_ms
         while not self.done:
+            if self.profiler.enabled:
+                self.profiler.begin_frame()
+            now = pg.time.get_ticks()
+            if self.paused:
+                lag = tick_ms if self.step_requested else 0
+                self.step_requested = False
+            else:
+                lag += (now - previous) * self.speed
+            previous = now
             self.event_loop()
-            self.update()
-            pg.display.update()
+
+            ticks = 0
+            catch_up = self.max_catch_up_ticks * self.speed
+            while lag >= tick_ms and not self.done:
+                lag -= tick_ms
+                ticks += 1
+                last = lag < tick_ms or ticks == catch_up
+                self.step(draw=last)
+                if last:
+                    break
+            if lag >= tick_ms:
+                # Too far behind to catch up; drop the backlog instead of
+                # spiralling into ever longer frames.
+                lag = lag % tick_ms
+
+            if ticks:
+                if self.profiler.enabled and self.rendering:
+                    self.profiler.draw(self.screen)
+                if self.state.dirty_rects is None:
+                    pg.display.update()
+                else:
+                    pg.display.update(self.state.dirty_rects)
+                if not startup_timer.reported:
+                    startup_timer.mark('first frame')
+                    startup_timer.report()
+            if self.profiler.enabled:
+                self.profiler.end_frame()
             self.clock.tick(self.fps)
             if self.show_fps:
                 fps = self.clock.get_fps()
@@ -292,6 +499,88 @@ class Control(object):
                 pg.display.set_caption(with_fps)
 
 
+    def step(self, keys=None, draw=True):
+        """Advances the game by exactly one tick (1/tick_rate of game time)
+        with the given key state.  Nothing is sent to the display and the
+        wall clock is not consulted, so callers can step as fast as they
+        like."""
+        if keys is not None:
+            self.keys = keys
+        if self.recorder is not None:
+            self.recorder.record(self.keys)
+        self.game_clock.advance()
+        self.update(draw)
+
+
+    def run_headless(self, max_ticks, policy=None):
+        """Steps the game uncapped until it is done or max_ticks have run.
+        policy(control) returns the key state for each tick; without one
+        the current keys are held.  Reports and returns ticks per second."""
+        start_ticks = self.game_clock.ticks
+        start = time.perf_counter()
+        while not self.done and self.game_clock.ticks - start_ticks < max_ticks:
+            if self.profiler.enabled:
+                self.profiler.begin_frame()
+            self.step(policy(self) if policy else None)
+            if self.profiler.enabled:
+                self.profiler.end_frame()
+            if not startup_timer.reported:
+                startup_timer.mark('first tick')
+                startup_timer.report()
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        ticks = self.game_clock.ticks - start_ticks
+        ticks_per_sec = ticks / elapsed
+        print("{} ticks in {:.2f}s - {:.0f} ticks/sec ({:.1f}x real time)".format(
+            ticks, elapsed, ticks_per_sec,
+            ticks_per_sec / self.game_clock.tick_rate))
+        return ticks_per_sec
+
+
+frame_cache = {}
+
+
+def get_frame(sheet, rect, scale, colorkey=c.BLACK, flip=(False, False)):
+    """Returns the part of sheet inside rect, colorkeyed and scaled by
+    scale (a multiplier or an exact (width, height)), optionally flipped
+    (x, y).  Frames are cached by all of their
+    arguments and shared by every sprite that asks for them, so they must
+    be treated as read only.  With colorkey None the sheet's own alpha is
+    kept instead."""
+    key = (sheet, tuple(rect), scale, colorkey, tuple(flip))
+    frame = frame_cache.get(key)
+    if frame is None:
+        if any(flip):
+            frame = flip_frame(get_frame(sheet, rect, scale, colorkey), *flip)
+        else:
+            frame = cut_frame(sheet, pg.Rect(rect), scale, colorkey)
+        frame_cache[key] = frame
+    return frame
+
+
+def cut_frame(sheet, rect, scale, colorkey):
+    """Uncached slice, colorkey and scale of a sprite sheet region"""
+    if isinstance(scale, tuple):
+        size = scale
+    else:
+        size = (int(rect.width*scale), int(rect.height*scale))
+    if colorkey is None:
+        return pg.transform.scale(sheet.subsurface(rect), size)
+    image = pg.Surface(rect.size).convert()
+    image.blit(sheet, (0, 0), rect)
+    image.set_colorkey(colorkey)
+    return pg.transform.scale(image, size)
+
+
+def flip_frame(frame, flip_x, flip_y):
+    """Cached pg.transform.flip of a shared frame"""
+    key = (frame, flip_x, flip_y)
+    flipped = frame_cache.get(key)
+    if flipped is None:
+        flipped = pg.transform.flip(frame, flip_x, flip_y)
+        frame_cache[key] = flipped
+    return flipped
+
+
 class _State(object):
     def __init__(self):
         self.start_time = 0.0
@@ -301,10 +590,20 @@ class _State(object):
         self.next = None
         self.previous = None
         self.persist = {}
+        self.rendering = True
+        # Set by Control when the state may redraw only what changed; the
+        # state then leaves the changed screen rects in dirty_rects (None
+        # means the whole screen was drawn).
+        self.dirty_rendering = False
+        self.dirty_rects = None
 
     def get_event(self, event):
         pass
 
+    def seed(self, seed):
+        """Seeds the state's random numbers, if it uses any"""
+        pass
+
     def startup(self, current_time, persistant):
         self.persist = persistant
         self.start_time = current_time
@@ -318,18 +617,42 @@ class _State(object):
 
 
 
-def load_all_gfx(directory, colorkey=(255,0,255), accept=('.png', 'jpg', 'bmp')):
+SFX_TYPES = ('.wav','.mpe','.ogg','.mdi')
+# Files in resources/sound that are never played as effects.  The sped up
+# theme is streamed from resources/music; decoding it costs ~300 ms.
+SFX_EXCLUDE = ('main_theme_sped_up',)
+
+
+def decode_all(directory, decode, accept, pool=None, exclude=()):
+    """Returns an iterator of (name, decode(path)) for every file in
+    directory with an extension in accept, except the names in exclude.
+    Given a thread pool, all files are submitted at once and decoded
+    concurrently (pygame lets go of the GIL while decoding); results still
+    come back in directory order."""
+    names = []
+    paths = []
+    for filename in os.listdir(directory):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() in accept and name not in exclude:
+            names.append(name)
+            paths.append(os.path.join(directory, filename))
+    if pool is None:
+        return zip(names, map(decode, paths))
+    return zip(names, pool.map(decode, paths))
+
+
+def load_all_gfx(directory, colorkey=(255,0,255), accept=('.png', 'jpg', 'bmp'),
+                 pool=None):
+    """Decodes every image (on the pool if given) and converts them to the
+    display format, which has to happen on the main thread"""
     graphics = {}
-    for pic in os.listdir(directory):
-        name, ext = os.path.splitext(pic)
-        if ext.lower() in accept:
-            img = pg.image.load(os.path.join(directory, pic))
-            if img.get_alpha():
-                img = img.convert_alpha()
-            else:
-                img = img.convert()
-                img.set_colorkey(colorkey)
-            graphics[name]=img
+    for name, img in decode_all(directory, pg.image.load, accept, pool):
+        if img.get_alpha():
+            img = img.convert_alpha()
+        else:
+            img = img.convert()
+            img.set_colorkey(colorkey)
+        graphics[name]=img
     return graphics
 
 
@@ -346,21 +669,5 @@ def load_all_fonts(directory, accept=('.ttf')):
     return load_all_music(directory, accept)
 
 
-def load_all_sfx(directory, accept=('.wav','.mpe','.ogg','.mdi')):
-    effects = {}
-    for fx in os.listdir(directory):
-        name, ext = os.path.splitext(fx)
-        if ext.lower() in accept:
-            effects[name] = pg.mixer.Sound(os.path.join(directory, fx))
-    return effects
-
-
-
-
-
-
-
-
-
-
-
+def load_all_sfx(directory, accept=SFX_TYPES, pool=None, exclude=SFX_EXCLUDE):
+    return dict(decode_all(directory, pg.mixer.Sound, accept, pool, exclude))
@@ -0,0 +1,196 @@
+"""
+Many MarioEnvs stepped together in worker processes.
+
+One process only uses one core, so VecEnv spreads its environments over
+worker processes and steps them all with one call:
+
+    from data.vecenv import VecEnv
+    if __name__ == '__main__':
+        envs = VecEnv(8, level=1, frame_skip=4)
+        observations = envs.reset()
+        observations, rewards, dones, infos = envs.step([2] * 8)
+        envs.close()
+
+step() sends the actions to every worker before waiting for any of them,
+so the workers run in parallel.  Results come back as lists in
+environment order, array observations stacked into one array.  An
+environment whose episode ended is reset by its worker at once: the
+observation returned for it is the first of the new episode and
+info['final_observation'] is the last of the old one.
+
+Workers are started with the spawn method, so each one sets up pygame
+for itself (scripts using VecEnv need the __main__ guard).  A worker that
+raises, dies or stops answering for timeout seconds is replaced by a new
+one; its environments are reported done, with info['crashed'] set.
+"""
+
+import copy
+import multiprocessing
+import os
+import traceback
+from .observation import stack
+
+DEFAULT_TIMEOUT = 60
+
+
+def worker(connection, configs):
+    """Runs in a worker process: builds a MarioEnv per config and answers
+    commands until told to close"""
+    from .env import MarioEnv
+    envs = [MarioEnv(**config) for config in configs]
+    while True:
+        command, data = connection.recv()
+        try:
+            if command == 'step':
+                results = []
+                for env, action in zip(envs, data):
+                    observation, reward, done, info = env.step(action)
+                    if done:
+                        # reset() may overwrite an array observation
+                        info['final_observation'] = copy.copy(observation)
+                        observation = env.reset()
+                    results.append((observation, reward, done, info))
+                connection.send(('ok', results))
+            elif command == 'reset':
+                connection.send(('ok', [env.reset(seed)
+                                        for env, seed in zip(envs, data)]))
+            elif command == 'close':
+                connection.close()
+                return
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+
+
+class WorkerCrashed(Exception):
+    """A worker raised, died or stopped answering"""
+
+
+class Worker(object):
+    """A worker process and the pipe to it"""
+    def __init__(self, context, configs):
+        self.configs = configs
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=worker, args=(child, configs),
+                                       daemon=True)
+        self.process.start()
+        child.close()
+
+    def send(self, command, data=None):
+        try:
+            self.connection.send((command, data))
+        except (OSError, EOFError):
+            raise WorkerCrashed('worker {} is gone'.format(self.process.pid))
+
+    def receive(self, timeout):
+        try:
+            if not self.connection.poll(timeout):
+                raise WorkerCrashed('worker {} did not answer in {}s'.format(
+                    self.process.pid, timeout))
+            status, data = self.connection.recv()
+        except (OSError, EOFError):
+            raise WorkerCrashed('worker {} died with exit code {}'.format(
+                self.process.pid, self.process.exitcode))
+        if status == 'error':
+            raise WorkerCrashed(data)
+        return data
+
+    def stop(self):
+        try:
+            self.connection.send(('close', None))
+        except (OSError, EOFError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+
+class VecEnv(object):
+    """count MarioEnvs in processes worker processes (one per core by
+    default).  Keyword arguments go to every MarioEnv; environment i gets
+    seed + i if a seed is given."""
+    def __init__(self, count, processes=None, seed=None,
+                 timeout=DEFAULT_TIMEOUT, **env_options):
+        if processes is None:
+            processes = os.cpu_count() or 1
+        processes = max(1, min(processes, count))
+        self.count = count
+        self.timeout = timeout
+        self.context = multiprocessing.get_context('spawn')
+        self.crashes = 0
+
+        configs = []
+        for index in range(count):
+            config = dict(env_options)
+            if seed is not None:
+                config['seed'] = seed + index
+            configs.append(config)
+        # Environments i * processes // count... go to the same worker
+        self.slices = []
+        self.workers = []
+        for number in range(processes):
+            start = number * count // processes
+            stop = (number + 1) * count // processes
+            self.slices.append(slice(start, stop))
+            self.workers.append(Worker(self.context, configs[start:stop]))
+
+    def restart(self, number, seeds=None):
+        """Replaces a crashed worker and returns its fresh observations"""
+        self.crashes += 1
+        old = self.workers[number]
+        old.stop()
+        if seeds is None:
+            seeds = [None] * len(old.configs)
+        self.workers[number] = Worker(self.context, old.configs)
+        self.workers[number].send('reset', seeds)
+        return self.workers[number].receive(self.timeout)
+
+    def reset(self, seeds=None):
+        """Starts a new episode in every environment.  seeds is None or a
+        seed (or None) for each environment."""
+        if seeds is None:
+            seeds = [None] * self.count
+        for worker, part in zip(self.workers, self.slices):
+            worker.send('reset', seeds[part])
+        observations = []
+        for number, worker in enumerate(self.workers):
+            try:
+                observations.extend(worker.receive(self.timeout))
+            except WorkerCrashed:
+                observations.extend(self.restart(number,
+                                                 seeds[self.slices[number]]))
+        return stack(observations)
+
+    def step(self, actions):
+        """Steps environment i with actions[i].  Returns lists of
+        observations, rewards, dones and infos."""
+        if len(actions) != self.count:
+            raise ValueError('expected {} actions, got {}'.format(
+                self.count, len(actions)))
+        sent = []
+        for worker, part in zip(self.workers, self.slices):
+            try:
+                worker.send('step', list(actions[part]))
+                sent.append(True)
+            except WorkerCrashed:
+                sent.append(False)
+
+        results = []
+        for number, worker in enumerate(self.workers):
+            try:
+                if not sent[number]:
+                    raise WorkerCrashed('worker is gone')
+                results.extend(worker.receive(self.timeout))
+            except WorkerCrashed as crash:
+                for observation in self.restart(number):
+                    results.append((observation, 0.0, True,
+                                    {'crashed': True, 'error': str(crash)}))
+
+        observations, rewards, dones, infos = zip(*results)
+        return stack(observations), list(rewards), list(dones), list(infos)
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
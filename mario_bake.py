@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+
+"""
+Bakes the sprite sheets and all scaled sprite frames into
+resources/baked/graphics.bake.  Run again after changing any image in
+resources/graphics; until then the game reads the PNGs.
+
+    python mario_bake.py
+"""
+
+import os
+import sys
+
+os.environ.setdefault('MARIO_HEADLESS', '1')
+
+import pygame as pg
+from data.bake import main
+
+
+if __name__=='__main__':
+    main()
+    pg.quit()
+    sys.exit()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+
+"""
+Steps Level 1 or Level 2 as fast as possible with no window or sound and
+reports the number of game ticks per second.
+
+    python mario_headless.py --level 1 --ticks 6000 [--render]
+"""
+
+import os
+import sys
+
+os.environ.setdefault('MARIO_HEADLESS', '1')
+
+import pygame as pg
+from data.headless import main
+
+
+if __name__=='__main__':
+    main()
+    pg.quit()
+    sys.exit()